@@ -5,6 +5,7 @@ import json
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
 from auth import admin_required, create_user, get_all_users, delete_user, change_password, get_db
+from schema import refresh_derived
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -144,6 +145,7 @@ def create_election():
     """, (year, election_type, party, redistricting_cycle))
     conn.commit()
     election_id = cursor.lastrowid
+    refresh_derived(conn)
     conn.close()
 
     flash(f'Election created (ID: {election_id}).', 'success')
@@ -211,6 +213,7 @@ def delete_election(election_id):
     cursor.execute("DELETE FROM elections WHERE id = ?", (election_id,))
 
     conn.commit()
+    refresh_derived(conn)
     conn.close()
 
     flash('Election deleted.', 'success')
@@ -362,6 +365,7 @@ def add_candidate(race_id):
                 pass  # Already exists
 
     conn.commit()
+    refresh_derived(conn, race_id)
     conn.close()
 
     flash(f'Candidate "{name}" added.', 'success')
@@ -382,6 +386,7 @@ def delete_race(race_id):
     cursor.execute("DELETE FROM results WHERE race_id = ?", (race_id,))
     cursor.execute("DELETE FROM races WHERE id = ?", (race_id,))
     conn.commit()
+    refresh_derived(conn)
     conn.close()
 
     flash('Race deleted.', 'success')
@@ -4,16 +4,22 @@ Analysis functions for NH Election Results Explorer
 Generates meaningful insights from election data
 """
 
+import threading
 import sqlite3
+from sys import intern
+from functools import lru_cache, wraps
+from bisect import bisect_left
 from pathlib import Path
 from collections import defaultdict
 import queries
+import schema
 
 DB_PATH = Path(__file__).parent / "nh_elections.db"
 
 # Office ordering by importance (lower = more important)
 # POTUS > GOV > US SEN > US REP > EC > SEN > REP
-OFFICE_ORDER = {
+# Keys are interned so lookups with interned fetched office names match by identity
+OFFICE_ORDER = {intern(name): rank for name, rank in {
     'President of the United States': 1,
     'Governor': 2,
     'United States Senator': 3,
@@ -22,7 +28,39 @@ OFFICE_ORDER = {
     'Executive Councilor': 5,
     'State Senator': 6,
     'State Representative': 7,
-}
+}.items()}
+
+
+# Interned party names. Aggregation loops intern fetched party/office strings
+# once per row, so party checks are identity compares and repeated dict keys
+# share one string object.
+_R = intern('Republican')
+_D = intern('Democratic')
+
+# Top-of-ticket and down-ballot offices compared when detecting ticket splits
+TOP_OFFICES = ('President of the United States', 'Governor')
+DOWN_OFFICES = ('State Representative', 'State Senator', 'Executive Councilor')
+
+# Offices shown (in order) in a town's key race grid
+KEY_OFFICES = (
+    'President of the United States',
+    'Governor',
+    'United States Senator',
+    'Representative in Congress',
+    'Executive Councilor',
+    'State Senator',
+    'State Representative',
+)
+
+# Same ordering as a SQL expression, so queries can return rows pre-sorted
+OFFICE_ORDER_SQL = "CASE o.name {} ELSE 99 END".format(
+    ' '.join(f"WHEN '{name}' THEN {rank}" for name, rank in OFFICE_ORDER.items())
+)
+
+# res.municipality with city wards ('Manchester Ward 8') folded into their town
+BASE_TOWN_SQL = """CASE WHEN instr(res.municipality, ' Ward ') > 0
+    THEN substr(res.municipality, 1, instr(res.municipality, ' Ward ') - 1)
+    ELSE res.municipality END"""
 
 
 def get_office_sort_key(office_name):
@@ -30,40 +68,103 @@ def get_office_sort_key(office_name):
     return OFFICE_ORDER.get(office_name, 99)
 
 
+# Lean buckets: a margin exactly on a bound falls in the lower bucket
+# (15 is "Likely R", -3 is "Lean D"), hence bisect_left
+LEAN_BOUNDS = (-15, -8, -3, 3, 8, 15)
+LEAN_LABELS = ("Safe D", "Likely D", "Lean D", "Toss-up", "Lean R", "Likely R", "Safe R")
+
+# Trend arrow by sign of change beyond +/-2 points
+TREND_ARROWS = {
+    1: "↗",   # Trending R
+    0: "→",   # Stable
+    -1: "↘",  # Trending D
+}
+
+
 def classify_lean(margin):
     """Classify a margin into a lean category."""
-    if margin > 15:
-        return "Safe R"
-    elif margin > 8:
-        return "Likely R"
-    elif margin > 3:
-        return "Lean R"
-    elif margin > -3:
-        return "Toss-up"
-    elif margin > -8:
-        return "Lean D"
-    elif margin > -15:
-        return "Likely D"
-    else:
-        return "Safe D"
+    return LEAN_LABELS[bisect_left(LEAN_BOUNDS, margin)]
 
 
 def get_trend_arrow(change):
     """Return trend arrow based on margin change."""
-    if change > 2:
-        return "↗"  # Trending R
-    elif change < -2:
-        return "↘"  # Trending D
-    else:
-        return "→"  # Stable
+    return TREND_ARROWS[(change > 2) - (change < -2)]
+
+
+def _intern(value):
+    """Intern a fetched party/office string (None passes through)."""
+    return intern(value) if value is not None else None
+
+
+_local = threading.local()
 
 
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Get this thread's read connection, opening it on first use.
+    The connection stays open for the life of the thread (don't close it), so
+    SQLite's page cache and prepared statements carry over between calls.
+    Rows are plain tuples; set cursor.row_factory = sqlite3.Row for named access.
+    Each call makes sure derived data is current if the database has changed.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, cached_statements=256)
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        # Analysis only reads; refuse writes on the shared handle
+        conn.execute("PRAGMA query_only=1")
+        _local.conn = conn
+        _local.path = DB_PATH
+    schema.ensure_derived_current(conn, DB_PATH)
     return conn
 
 
+# Memoized analysis results. Cached values are shared between callers, so
+# they must be treated as read-only. Entries are keyed by the database file
+# (and WAL) stamp read before computing, and every cache is dropped when the
+# stamp changes, so results entered by any worker show up and a result
+# computed from an older snapshot is never served after a write.
+_cached_functions = []
+_cache_stamp = None
+
+
+def _db_stamp():
+    """(mtime, size) of the database and its WAL file."""
+    return schema.db_stamp(DB_PATH)
+
+
+def clear_analysis_cache():
+    """Drop all memoized analysis results."""
+    for func in _cached_functions:
+        func.cache_clear()
+
+
+def db_cached(maxsize=128):
+    """lru_cache that is invalidated whenever the database changes."""
+    def decorator(func):
+        @lru_cache(maxsize=maxsize)
+        def cached(stamp, *args, **kwargs):
+            return func(*args, **kwargs)
+        _cached_functions.append(cached)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            global _cache_stamp
+            stamp = _db_stamp()
+            if stamp != _cache_stamp:
+                clear_analysis_cache()
+                _cache_stamp = stamp
+            return cached(stamp, *args, **kwargs)
+
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.cache_info = cached.cache_info
+        return wrapper
+    return decorator
+
+
+@db_cached(maxsize=512)
 def get_town_summary(town):
     """
     Get a comprehensive summary of a town's voting patterns.
@@ -75,7 +176,10 @@ def get_town_summary(town):
     conn = get_connection()
     cursor = conn.cursor()
 
-    # First, get State Rep votes using deduplicated canonical races
+    # One query for every office by year: State Rep as total party votes from
+    # deduplicated canonical races, other offices as top vote-getter per party.
+    # State Rep rows sort last within each year. Every row also carries the
+    # town's county.
     cursor.execute("""
         WITH race_totals AS (
             SELECT r.id as race_id, e.year, r.county, r.district, SUM(res.votes) as total
@@ -95,100 +199,77 @@ def get_town_summary(town):
                 FROM race_totals rt2
                 WHERE rt2.year = rt.year AND rt2.county = rt.county AND rt2.district = rt.district
             )
+        ),
+        state_rep AS (
+            SELECT
+                cr.year,
+                'State Representative' as office,
+                SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as top_r,
+                SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as top_d
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN canonical_races cr ON res.race_id = cr.race_id
+            WHERE res.municipality = ?1
+            AND c.party IN ('Republican', 'Democratic')
+            GROUP BY cr.year
+        ),
+        other_offices AS (
+            SELECT
+                e.year,
+                o.name as office,
+                MAX(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as top_r,
+                MAX(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as top_d,
+                SUM(res.votes) as total
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE res.municipality = ?1
+            AND e.election_type = 'general'
+            AND c.is_real = 1
+            AND o.name != 'State Representative'
+            GROUP BY e.year, o.name
         )
-        SELECT
-            cr.year,
-            c.party,
-            SUM(res.votes) as votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN canonical_races cr ON res.race_id = cr.race_id
-        WHERE res.municipality = ?
-        AND c.party IN ('Republican', 'Democratic')
-        GROUP BY cr.year, c.party
-    """, (town,))
-
-    # Store State Rep totals by year
-    state_rep_by_year = defaultdict(lambda: {'R': 0, 'D': 0})
-    for year, party, votes in cursor.fetchall():
-        p = 'R' if party == 'Republican' else 'D'
-        state_rep_by_year[year][p] = votes
-
-    # Get all other results for this town
-    cursor.execute("""
-        SELECT
-            e.year,
-            o.name as office,
-            r.district,
-            r.county,
-            c.name as candidate,
-            c.party,
-            res.votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        JOIN offices o ON r.office_id = o.id
-        WHERE res.municipality = ?
-        AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        AND o.name != 'State Representative'
-        ORDER BY e.year, o.name, res.votes DESC
+        SELECT year, office, top_r, top_d, total, (
+            SELECT r.county
+            FROM results res
+            JOIN races r ON res.race_id = r.id
+            WHERE res.municipality = ?1 AND r.county IS NOT NULL
+            LIMIT 1
+        ) as county
+        FROM (
+            SELECT year, office, top_r, top_d, total, 0 as is_state_rep FROM other_offices
+            UNION ALL
+            SELECT year, office, top_r, top_d, top_r + top_d, 1 FROM state_rep
+        )
+        ORDER BY year, is_state_rep, office
     """, (town,))
 
-    results = cursor.fetchall()
-    if not results and not state_rep_by_year:
-        conn.close()
+    rows = cursor.fetchall()
+    if not rows:
         return None
-
-    # Track individual candidate votes by year/office (for non-State-Rep)
-    candidate_votes = defaultdict(lambda: defaultdict(list))
-
-    for row in results:
-        year = row['year']
-        office = row['office']
-        party = row['party']
-        votes = row['votes']
-        candidate_votes[year][office].append({'party': party, 'votes': votes})
+    county = rows[0][5]
 
     # Calculate margins by year
-    # Combine years from both queries
-    all_years = set(candidate_votes.keys()) | set(state_rep_by_year.keys())
-    years = sorted(all_years)
     margins_by_year = {}
-    by_year = defaultdict(lambda: defaultdict(lambda: {'top_r': 0, 'top_d': 0, 'total': 0}))
-
-    for year in years:
-        year_top_r = 0
-        year_top_d = 0
-        year_total = 0
-
-        # Add non-State-Rep offices (using top vote-getter)
-        for office, candidates in candidate_votes.get(year, {}).items():
-            top_r = max((c['votes'] for c in candidates if c['party'] == 'Republican'), default=0)
-            top_d = max((c['votes'] for c in candidates if c['party'] == 'Democratic'), default=0)
-            total = sum(c['votes'] for c in candidates)
-
-            by_year[year][office]['top_r'] = top_r
-            by_year[year][office]['top_d'] = top_d
-            by_year[year][office]['total'] = total
-
-            year_top_r += top_r
-            year_top_d += top_d
-            year_total += total
-
-        # Add State Rep (using deduplicated total party votes)
-        if year in state_rep_by_year:
-            sr_r = state_rep_by_year[year]['R']
-            sr_d = state_rep_by_year[year]['D']
-            by_year[year]['State Representative']['top_r'] = sr_r
-            by_year[year]['State Representative']['top_d'] = sr_d
-            by_year[year]['State Representative']['total'] = sr_r + sr_d
-
-            year_top_r += sr_r
-            year_top_d += sr_d
-            year_total += sr_r + sr_d
-
+    by_year = {}
+    year_totals = {}
+
+    for year, office, top_r, top_d, total, _ in rows:
+        offices = by_year.get(year)
+        if offices is None:
+            offices = by_year[year] = {}
+            year_totals[year] = [0, 0, 0]
+        offices[office] = {'top_r': top_r, 'top_d': top_d, 'total': total}
+
+        totals = year_totals[year]
+        totals[0] += top_r
+        totals[1] += top_d
+        totals[2] += total
+
+    years = list(year_totals)
+    for year, (year_top_r, year_top_d, year_total) in year_totals.items():
         if year_top_r + year_top_d > 0:
             total_top = year_top_r + year_top_d
             r_pct = (year_top_r / total_top) * 100
@@ -214,54 +295,32 @@ def get_town_summary(town):
         trend_direction = 'stable'
 
     # Detect ticket splitting using top vote-getter comparison
+    # Party sign: 1 = R ahead, -1 = D ahead, 0 = tied
     ticket_splits = []
     for year in years:
         offices = by_year[year]
 
         # Find top of ticket winner
-        top_ticket = None
-        top_ticket_office = None
-        for office in ['President of the United States', 'Governor']:
-            if office in offices:
-                data = offices[office]
-                if data['top_r'] > data['top_d']:
-                    top_ticket = 'R'
-                elif data['top_d'] > data['top_r']:
-                    top_ticket = 'D'
-                top_ticket_office = office
-                break
-
-        if top_ticket:
-            # Check down-ballot
-            for office in ['State Representative', 'State Senator', 'Executive Councilor']:
-                if office in offices:
-                    data = offices[office]
-                    if data['top_r'] > data['top_d']:
-                        down_ballot = 'R'
-                    elif data['top_d'] > data['top_r']:
-                        down_ballot = 'D'
-                    else:
-                        continue
-
-                    if down_ballot != top_ticket:
-                        ticket_splits.append({
-                            'year': year,
-                            'top_ticket': f"{top_ticket_office}: {'Republican' if top_ticket == 'R' else 'Democratic'}",
-                            'down_ballot': f"{office}: {'Republican' if down_ballot == 'R' else 'Democratic'}"
-                        })
-
-    # Get county
-    cursor.execute("""
-        SELECT DISTINCT r.county
-        FROM results res
-        JOIN races r ON res.race_id = r.id
-        WHERE res.municipality = ? AND r.county IS NOT NULL
-        LIMIT 1
-    """, (town,))
-    row = cursor.fetchone()
-    county = row[0] if row else None
+        top_ticket_office = next((o for o in TOP_OFFICES if o in offices), None)
+        if top_ticket_office is None:
+            continue
+        data = offices[top_ticket_office]
+        top_ticket = (data['top_r'] > data['top_d']) - (data['top_d'] > data['top_r'])
+        if not top_ticket:
+            continue
 
-    conn.close()
+        # Check down-ballot
+        for office in DOWN_OFFICES:
+            data = offices.get(office)
+            if data is None:
+                continue
+            down_ballot = (data['top_r'] > data['top_d']) - (data['top_d'] > data['top_r'])
+            if down_ballot and down_ballot != top_ticket:
+                ticket_splits.append({
+                    'year': year,
+                    'top_ticket': f"{top_ticket_office}: {'Republican' if top_ticket > 0 else 'Democratic'}",
+                    'down_ballot': f"{office}: {'Republican' if down_ballot > 0 else 'Democratic'}"
+                })
 
     # Build summary - find latest year with R/D data
     if not margins_by_year:
@@ -293,7 +352,7 @@ def get_town_summary(town):
         'trend': round(trend, 1),
         'trend_direction': trend_direction,
         'ticket_splits': ticket_splits,
-        'by_year': dict(by_year)
+        'by_year': by_year
     }
 
 
@@ -303,7 +362,8 @@ def get_town_race_details(town, year):
     cursor = conn.cursor()
 
     # Get results grouped by race
-    cursor.execute("""
+    # Sorted by office importance (POTUS -> GOV -> US SEN -> US REP -> EXEC -> STATE SEN -> STATE REP)
+    cursor.execute(f"""
         SELECT
             o.name as office,
             r.id as race_id,
@@ -322,110 +382,109 @@ def get_town_race_details(town, year):
         WHERE res.municipality = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        ORDER BY o.name, r.district, res.votes DESC
+        AND c.is_real = 1
+        ORDER BY {OFFICE_ORDER_SQL}, COALESCE(r.district, ''), o.name, r.district, res.votes DESC
     """, (town, year))
 
     results = cursor.fetchall()
 
-    # Get district-wide winners for each race
-    race_ids = set(r['race_id'] for r in results)
-    if not race_ids:
-        conn.close()
+    if not results:
         return []
 
-    placeholders = ','.join('?' * len(race_ids))
-    cursor.execute(f"""
-        SELECT
-            r.id as race_id,
-            r.seats,
-            c.id as candidate_id,
-            SUM(res.votes) as total_votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        WHERE r.id IN ({placeholders})
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        GROUP BY r.id, c.id
-        ORDER BY r.id, total_votes DESC
-    """, list(race_ids))
-
-    # Build winner lookup - handle ties correctly
-    # Group candidates by race first
-    race_candidates = defaultdict(list)
-    race_seats = {}
-    for row in cursor.fetchall():
-        race_id, seats, candidate_id, total_votes = row
-        race_candidates[race_id].append({'id': candidate_id, 'votes': total_votes})
-        race_seats[race_id] = seats
-
-    # Determine winners, excluding ties at cutoff
-    winners = {}
-    for race_id, candidates in race_candidates.items():
-        seats = race_seats[race_id]
-        winners[race_id] = set()
-
-        # Candidates already sorted by votes DESC
-        for i, cand in enumerate(candidates):
-            if i < seats:
-                # Check for tie at cutoff
-                if i == seats - 1 and i + 1 < len(candidates):
-                    if cand['votes'] == candidates[i + 1]['votes']:
-                        # Tie at cutoff - don't count as winner
-                        continue
-                winners[race_id].add(cand['id'])
-
-    conn.close()
-
-    # Group results by race
+    # Get district-wide winners for each race the town voted in: the top
+    # `seats` candidates by votes, except that the candidate in the last seat
+    # doesn't win if tied with the next candidate.
+    cursor.execute("""
+        WITH town_races AS (
+            SELECT DISTINCT res.race_id
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            WHERE res.municipality = ?
+            AND e.year = ?
+            AND e.election_type = 'general'
+            AND c.is_real = 1
+        ),
+        ranked AS (
+            SELECT
+                r.id as race_id,
+                r.seats,
+                c.id as candidate_id,
+                ROW_NUMBER() OVER w as position,
+                SUM(res.votes) = LEAD(SUM(res.votes)) OVER w as tied_with_next
+            FROM town_races tr
+            JOIN races r ON r.id = tr.race_id
+            JOIN results res ON res.race_id = tr.race_id
+            JOIN candidates c ON res.candidate_id = c.id
+            WHERE c.is_real = 1
+            GROUP BY r.id, c.id
+            WINDOW w AS (PARTITION BY r.id ORDER BY SUM(res.votes) DESC)
+        )
+        SELECT race_id, candidate_id
+        FROM ranked
+        WHERE position < seats
+        OR (position = seats AND tied_with_next IS NOT 1)
+    """, (town, year))
+
+    winners = defaultdict(set)
+    for race_id, candidate_id in cursor:
+        winners[race_id].add(candidate_id)
+
+    # Group results by race, tracking the TOP vote-getter per party as we go
+    # This is fair for multi-member races where one party may run more candidates
     races = {}
-    for row in results:
-        race_key = (row['office'], row['district'])
-        if race_key not in races:
-            races[race_key] = {
-                'office': row['office'],
-                'district': row['district'],
-                'county': row['county'],
-                'seats': row['seats'],
-                'candidates': []
+    for office, race_id, district, county, seats, candidate_id, candidate, party, votes in results:
+        office = intern(office)
+        party = _intern(party)
+        race_key = (office, district)
+        race = races.get(race_key)
+        if race is None:
+            race = races[race_key] = {
+                'office': office,
+                'district': district,
+                'county': county,
+                'seats': seats,
+                'candidates': [],
+                'r_votes': 0,
+                'd_votes': 0
             }
 
-        is_winner = row['candidate_id'] in winners.get(row['race_id'], set())
-        races[race_key]['candidates'].append({
-            'name': row['candidate'],
-            'party': row['party'],
-            'votes': row['votes'],
+        is_winner = candidate_id in winners.get(race_id, ())
+        race['candidates'].append({
+            'name': candidate,
+            'party': party,
+            'votes': votes,
             'is_winner': is_winner
         })
-
-    # Calculate margins for each race using TOP vote-getter per party
-    # This is fair for multi-member races where one party may run more candidates
-    for race_key, race in races.items():
-        # Find top vote-getter per party
-        top_r = max((c['votes'] for c in race['candidates'] if c['party'] == 'Republican'), default=0)
-        top_d = max((c['votes'] for c in race['candidates'] if c['party'] == 'Democratic'), default=0)
-        total = sum(c['votes'] for c in race['candidates'])
+        if party is _R:
+            if votes > race['r_votes']:
+                race['r_votes'] = votes
+        elif party is _D:
+            if votes > race['d_votes']:
+                race['d_votes'] = votes
+
+    # Calculate margins for each race
+    for race in races.values():
+        top_r = race['r_votes']
+        top_d = race['d_votes']
         rd_total = top_r + top_d
 
         if rd_total > 0:
-            race['r_votes'] = top_r
-            race['d_votes'] = top_d
             race['margin'] = top_r - top_d
             # Margin based on top vote-getters: (top_R - top_D) / (top_R + top_D) * 100
             race['margin_pct'] = round((top_r - top_d) / rd_total * 100, 1)
             race['winner_party'] = 'R' if top_r > top_d else 'D' if top_d > top_r else 'Tie'
         else:
-            race['r_votes'] = 0
-            race['d_votes'] = 0
             race['margin'] = 0
             race['margin_pct'] = 0
             race['winner_party'] = None
 
-    # Sort races by office importance (POTUS -> US SEN -> US REP -> GOV -> EXEC -> STATE SEN -> STATE REP)
-    sorted_races = sorted(races.values(), key=lambda r: (get_office_sort_key(r['office']), r['district'] or ''))
-    return sorted_races
+    # Rows arrived in office-importance order, so insertion order is already sorted
+    return list(races.values())
 
 
+@db_cached()
 def get_statewide_trends():
     """
     Get statewide party control trends over time.
@@ -434,69 +493,51 @@ def get_statewide_trends():
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Get all race results with vote totals
+    # Rank candidates within each race and count R/D winners per year/office
+    # (offices ordered by their first race). The top `seats` candidates win,
+    # except that the candidate in the last seat doesn't if tied with the next.
     cursor.execute("""
-        SELECT
-            e.year,
-            o.name as office,
-            r.id as race_id,
-            r.seats,
-            c.id as candidate_id,
-            c.party,
-            SUM(res.votes) as total_votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        JOIN offices o ON r.office_id = o.id
-        WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        GROUP BY r.id, c.id
-        ORDER BY e.year, r.id, total_votes DESC
+        WITH ranked AS (
+            SELECT
+                e.year,
+                o.name as office,
+                r.id as race_id,
+                r.seats,
+                c.party,
+                ROW_NUMBER() OVER w as position,
+                SUM(res.votes) = LEAD(SUM(res.votes)) OVER w as tied_with_next
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE e.election_type = 'general'
+            AND c.is_real = 1
+            GROUP BY r.id, c.id
+            WINDOW w AS (PARTITION BY r.id ORDER BY SUM(res.votes) DESC)
+        )
+        SELECT year, office, party, COUNT(*) as winners
+        FROM ranked
+        WHERE (position < seats OR (position = seats AND tied_with_next IS NOT 1))
+        AND party IN ('Republican', 'Democratic')
+        GROUP BY year, office, party
+        ORDER BY year, MIN(race_id)
     """)
 
-    # Process race by race to handle ties correctly
-    races = defaultdict(list)
-    for row in cursor.fetchall():
-        year, office, race_id, seats, cand_id, party, votes = row
-        races[(year, office, race_id, seats)].append({'party': party, 'votes': votes})
-
-    conn.close()
-
-    # Count winners, handling ties
     results = defaultdict(lambda: defaultdict(lambda: {'R': 0, 'D': 0}))
+    for year, office, party, winners in cursor:
+        results[year][office]['R' if party == 'Republican' else 'D'] = winners
 
-    for (year, office, race_id, seats), candidates in races.items():
-        # Sort by votes DESC
-        candidates.sort(key=lambda x: -x['votes'])
-
-        # Find winners - but if there's a tie at the cutoff, exclude tied candidates
-        winners = []
-        for i, cand in enumerate(candidates):
-            if i < seats:
-                # Check if this candidate is tied with someone who wouldn't win
-                if i == seats - 1 and i + 1 < len(candidates):
-                    # Last winning position - check for tie with next candidate
-                    if cand['votes'] == candidates[i + 1]['votes']:
-                        # Tie at cutoff - this candidate doesn't win
-                        continue
-                winners.append(cand)
-            else:
-                break
-
-        # Count by party
-        for w in winners:
-            if w['party'] == 'Republican':
-                results[year][office]['R'] += 1
-            elif w['party'] == 'Democratic':
-                results[year][office]['D'] += 1
+    # Plain dicts: the result is cached and shared, so lookups must not insert
+    return {year: dict(offices) for year, offices in results.items()}
 
-    return dict(results)
 
-
-def compare_years(town, year1, year2):
-    """Compare a town's results between two years."""
-    summary1 = get_town_summary(town)
+def compare_years(town, year1, year2, summary=None):
+    """
+    Compare a town's results between two years.
+    Pass the town's get_town_summary() result as summary if already in hand.
+    """
+    summary1 = summary or get_town_summary(town)
     if not summary1 or year1 not in summary1['margins_by_year'] or year2 not in summary1['margins_by_year']:
         return None
 
@@ -521,6 +562,7 @@ def compare_years(town, year1, year2):
     }
 
 
+@db_cached(maxsize=32)
 def get_party_control(year):
     """Get party control seat counts for legislative offices.
 
@@ -545,7 +587,7 @@ def get_party_control(year):
             JOIN offices o ON r.office_id = o.id
             WHERE e.year = ?
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND o.name IN ('State Representative', 'State Senator', 'Executive Councilor')
             GROUP BY r.id, c.id
         ),
@@ -571,8 +613,7 @@ def get_party_control(year):
     """, (year,))
 
     results = {}
-    for row in cursor.fetchall():
-        office, party, seats = row
+    for office, party, seats in cursor:
         if office not in results:
             results[office] = {'R': 0, 'D': 0, 'Other': 0}
         if party == 'Republican':
@@ -582,7 +623,6 @@ def get_party_control(year):
         else:
             results[office]['Other'] += seats
 
-    conn.close()
     return results
 
 
@@ -611,7 +651,7 @@ def get_closest_races(year, limit=10):
             JOIN offices o ON r.office_id = o.id
             WHERE e.year = ?
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id
         )
         SELECT
@@ -628,8 +668,7 @@ def get_closest_races(year, limit=10):
     """, (year, limit))
 
     results = []
-    for row in cursor.fetchall():
-        office, district, county, r_votes, d_votes, margin = row
+    for office, district, county, r_votes, d_votes, margin in cursor:
         results.append({
             'office': office,
             'district': district,
@@ -640,7 +679,6 @@ def get_closest_races(year, limit=10):
             'label': f"{county} {district}" if county else f"District {district}"
         })
 
-    conn.close()
     return results
 
 
@@ -652,6 +690,8 @@ def get_biggest_shifts(year1, year2, limit=10):
     conn = get_connection()
     cursor = conn.cursor()
 
+    # One scan of both years, pivoted per race (office/district/county) with
+    # conditional aggregation instead of self-joining the per-year margins
     cursor.execute("""
         WITH race_margins AS (
             SELECT
@@ -666,38 +706,33 @@ def get_biggest_shifts(year1, year2, limit=10):
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
-            WHERE e.year IN (?, ?)
+            WHERE e.year IN (?1, ?2)
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY e.year, r.id
         ),
-        margins AS (
+        pivoted AS (
             SELECT
-                year, office, district, county,
-                CASE WHEN r_votes + d_votes > 0
-                    THEN (r_votes - d_votes) * 100.0 / (r_votes + d_votes)
-                    ELSE 0
-                END as margin
+                office, district, county,
+                MAX(CASE WHEN year = ?1 THEN (r_votes - d_votes) * 100.0 / (r_votes + d_votes) END) as m1,
+                MAX(CASE WHEN year = ?2 THEN (r_votes - d_votes) * 100.0 / (r_votes + d_votes) END) as m2
             FROM race_margins
             WHERE r_votes > 0 AND d_votes > 0
+            GROUP BY office, COALESCE(district, ''), COALESCE(county, '')
+            HAVING m1 IS NOT NULL AND m2 IS NOT NULL
         )
         SELECT
-            m1.office, m1.district, m1.county,
-            ROUND(m1.margin, 1) as margin1,
-            ROUND(m2.margin, 1) as margin2,
-            ROUND(m2.margin - m1.margin, 1) as shift
-        FROM margins m1
-        JOIN margins m2 ON m1.office = m2.office
-            AND COALESCE(m1.district, '') = COALESCE(m2.district, '')
-            AND COALESCE(m1.county, '') = COALESCE(m2.county, '')
-        WHERE m1.year = ? AND m2.year = ?
-        ORDER BY ABS(shift) DESC
-        LIMIT ?
-    """, (year1, year2, year1, year2, limit))
+            office, district, county,
+            ROUND(m1, 1) as margin1,
+            ROUND(m2, 1) as margin2,
+            ROUND(m2 - m1, 1) as shift
+        FROM pivoted
+        ORDER BY ABS(shift) DESC, office, county, district
+        LIMIT ?3
+    """, (year1, year2, limit))
 
     results = []
-    for row in cursor.fetchall():
-        office, district, county, margin1, margin2, shift = row
+    for office, district, county, margin1, margin2, shift in cursor:
         results.append({
             'office': office,
             'district': district,
@@ -709,10 +744,10 @@ def get_biggest_shifts(year1, year2, limit=10):
             'label': f"{county} {district}" if county else f"District {district}"
         })
 
-    conn.close()
     return results
 
 
+@db_cached(maxsize=16)
 def get_county_summary(county):
     """Get summary of a county's voting patterns, towns, and results by race."""
     conn = get_connection()
@@ -724,50 +759,75 @@ def get_county_summary(county):
         FROM results res
         JOIN races r ON res.race_id = r.id
         WHERE r.county = ?
-        AND res.municipality NOT GLOB '[0-9]*'
-        AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        AND res.is_town = 1
         ORDER BY res.municipality
     """, (county,))
-    towns = [row[0] for row in cursor.fetchall()]
+    towns = [row[0] for row in cursor]
 
     if not towns:
-        conn.close()
         return None
 
     placeholders = ','.join('?' * len(towns))
 
-    # Get individual race results (with district) for these towns
+    # Get individual race results (with district) and per-year totals for these
+    # towns in one pass: the filtered join is materialized once and grouped twice.
+    # Per-year total rows have a NULL office.
     cursor.execute(f"""
+        WITH base AS MATERIALIZED (
+            SELECT e.year, o.name as office, r.district, c.party, res.votes
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE res.municipality IN ({placeholders})
+            AND e.election_type = 'general'
+            AND c.is_real = 1
+        )
         SELECT
-            e.year,
-            o.name as office,
-            r.district,
-            SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-            SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes,
-            SUM(res.votes) as total_votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        JOIN offices o ON r.office_id = o.id
-        WHERE res.municipality IN ({placeholders})
-        AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        GROUP BY e.year, o.name, r.district
-        ORDER BY e.year DESC, o.name, r.district
+            year,
+            office,
+            district,
+            SUM(CASE WHEN party = 'Republican' THEN votes ELSE 0 END) as r_votes,
+            SUM(CASE WHEN party = 'Democratic' THEN votes ELSE 0 END) as d_votes,
+            SUM(votes) as total_votes
+        FROM base
+        GROUP BY year, office, district
+        UNION ALL
+        SELECT
+            year,
+            NULL,
+            NULL,
+            SUM(CASE WHEN party = 'Republican' THEN votes ELSE 0 END),
+            SUM(CASE WHEN party = 'Democratic' THEN votes ELSE 0 END),
+            SUM(votes)
+        FROM base
+        GROUP BY year
+        ORDER BY 1 DESC, 2, 3
     """, towns)
 
     # Organize races by year
     races_by_year = defaultdict(list)
     years_set = set()
     presidential_results = []
+    margins_by_year = {}
 
-    for row in cursor.fetchall():
-        year, office, district, r_votes, d_votes, total = row
+    for year, office, district, r_votes, d_votes, total in cursor:
         years_set.add(year)
         rd_total = r_votes + d_votes
         margin = ((r_votes - d_votes) / rd_total * 100) if rd_total > 0 else 0
 
+        # Per-year aggregate (for overall margin)
+        if office is None:
+            margins_by_year[year] = {
+                'r_votes': r_votes,
+                'd_votes': d_votes,
+                'total_votes': total,
+                'margin': round(margin, 1)
+            }
+            continue
+
+        office = intern(office)
         race_data = {
             'office': office,
             'district': district,
@@ -784,6 +844,9 @@ def get_county_summary(county):
         else:
             races_by_year[year].append(race_data)
 
+    # Totals arrived newest first; keep margins in chronological order
+    margins_by_year = dict(sorted(margins_by_year.items()))
+
     # Sort races within each year by office importance
     for year in races_by_year:
         races_by_year[year].sort(key=lambda x: (get_office_sort_key(x['office']), x['district'] or ''))
@@ -809,7 +872,7 @@ def get_county_summary(county):
             JOIN offices o ON r.office_id = o.id
             WHERE res.municipality IN ({placeholders})
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id, c.id
         )
         SELECT year, office, party, COUNT(*) as seats_won,
@@ -819,8 +882,7 @@ def get_county_summary(county):
         GROUP BY year, office, party
     """, towns)
 
-    for row in cursor.fetchall():
-        year, office, party, seats, votes = row
+    for year, office, party, seats, votes in cursor:
         if party == 'Republican':
             office_summary_by_year[year][office]['r_seats'] += seats
             office_summary_by_year[year][office]['r_votes'] += votes
@@ -832,38 +894,7 @@ def get_county_summary(county):
     # Sort presidential results by year descending
     presidential_results.sort(key=lambda x: -x['year'])
 
-    # Get aggregate totals by year (for overall margin)
-    cursor.execute(f"""
-        SELECT
-            e.year,
-            SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-            SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes,
-            SUM(res.votes) as total_votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        WHERE res.municipality IN ({placeholders})
-        AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        GROUP BY e.year
-        ORDER BY e.year
-    """, towns)
-
-    margins_by_year = {}
-    for row in cursor.fetchall():
-        year, r_votes, d_votes, total = row
-        rd_total = r_votes + d_votes
-        margin = ((r_votes - d_votes) / rd_total * 100) if rd_total > 0 else 0
-        margins_by_year[year] = {
-            'r_votes': r_votes,
-            'd_votes': d_votes,
-            'total_votes': total,
-            'margin': round(margin, 1)
-        }
-
     years = sorted(years_set)
-    conn.close()
 
     if not years:
         return None
@@ -905,68 +936,58 @@ def get_county_summary(county):
     }
 
 
+@db_cached(maxsize=16)
 def get_statewide_baseline(year=None):
     """
-    Calculate statewide R% for competitive races only.
-    A race is competitive if both R and D candidates ran.
-    Returns dict by year with R percentage for all competitive races combined.
+    Statewide R% for competitive races only.
+    A race is competitive if both R and D candidates ran (races.is_competitive).
+    Returns dict by year with R percentage for all competitive races combined,
+    read from the statewide_baseline table built by schema.refresh_derived().
     """
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Get all race results with party totals
-    year_filter = "AND e.year = ?" if year else ""
-    params = (year,) if year else ()
-
-    cursor.execute(f"""
-        SELECT
-            e.year,
-            r.id as race_id,
-            o.name as office,
-            SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-            SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes,
-            SUM(res.votes) as total_votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        JOIN offices o ON r.office_id = o.id
-        WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        {year_filter}
-        GROUP BY e.year, r.id
-    """, params)
-
-    # Aggregate only competitive races (both R and D have votes)
-    by_year = defaultdict(lambda: {'r_votes': 0, 'd_votes': 0, 'total': 0, 'races': 0})
-
-    for row in cursor.fetchall():
-        year_val, race_id, office, r_votes, d_votes, total = row
-        # Only count if BOTH parties had candidates
-        if r_votes > 0 and d_votes > 0:
-            by_year[year_val]['r_votes'] += r_votes
-            by_year[year_val]['d_votes'] += d_votes
-            by_year[year_val]['total'] += total
-            by_year[year_val]['races'] += 1
+    columns = "year, r_pct, r_votes, d_votes, total, competitive_races"
+    if year:
+        cursor.execute(f"SELECT {columns} FROM statewide_baseline WHERE year = ?", (year,))
+    else:
+        cursor.execute(f"SELECT {columns} FROM statewide_baseline ORDER BY year")
 
-    conn.close()
-
-    # Calculate R percentage for each year
     result = {}
-    for yr, data in by_year.items():
-        if data['total'] > 0:
-            r_pct = (data['r_votes'] / data['total']) * 100
-            result[yr] = {
-                'r_pct': round(r_pct, 2),
-                'r_votes': data['r_votes'],
-                'd_votes': data['d_votes'],
-                'total': data['total'],
-                'competitive_races': data['races']
-            }
+    for yr, r_pct, r_votes, d_votes, total, races in cursor:
+        result[yr] = {
+            'r_pct': round(r_pct, 2),
+            'r_votes': r_votes,
+            'd_votes': d_votes,
+            'total': total,
+            'competitive_races': races
+        }
 
     return result
 
 
+def _pvi_by_year(votes_by_year, state_r_pct_by_year, pct_key):
+    """
+    Per-year PVI from {year: [r_votes, total, ...]} and {year: statewide R%}.
+    Returns (pvi_by_year, sorted years); years with no votes or no statewide
+    baseline get no PVI entry. pct_key names the local R% field.
+    """
+    pvi_by_year = {}
+    years = sorted(votes_by_year)
+    for year in years:
+        r_votes, total = votes_by_year[year][:2]
+        state_r_pct = state_r_pct_by_year.get(year)
+        if total > 0 and state_r_pct is not None:
+            r_pct = (r_votes / total) * 100
+            pvi_by_year[year] = {
+                'pvi': round(r_pct - state_r_pct, 1),
+                pct_key: round(r_pct, 1),
+                'state_r_pct': round(state_r_pct, 1)
+            }
+    return pvi_by_year, years
+
+
+@db_cached(maxsize=512)
 def get_town_pvi(town):
     """
     Calculate PVI (Partisan Voter Index) for a town.
@@ -993,46 +1014,29 @@ def get_town_pvi(town):
         JOIN offices o ON r.office_id = o.id
         WHERE res.municipality = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND r.is_competitive = 1
+        AND c.is_real = 1
         GROUP BY e.year, r.id
+        HAVING r_votes > 0 AND d_votes > 0
     """, (town,))
 
-    # Aggregate only competitive races
-    town_by_year = defaultdict(lambda: {'r_votes': 0, 'd_votes': 0, 'total': 0, 'races': 0})
+    # Aggregate races where BOTH parties had votes in this town (the HAVING
+    # clause; statewide-competitive races can still be one-sided locally)
+    # Per-year [r_votes, total, races] lists: positional increments, no key hashing
+    town_by_year = defaultdict(lambda: [0, 0, 0])
 
-    for row in cursor.fetchall():
-        year, race_id, office, r_votes, d_votes, total = row
-        # Only count if BOTH parties had candidates
-        if r_votes > 0 and d_votes > 0:
-            town_by_year[year]['r_votes'] += r_votes
-            town_by_year[year]['d_votes'] += d_votes
-            town_by_year[year]['total'] += total
-            town_by_year[year]['races'] += 1
+    for year, race_id, office, r_votes, d_votes, total in cursor:
+        year_data = town_by_year[year]
+        year_data[0] += r_votes
+        year_data[1] += total
+        year_data[2] += 1
 
-    conn.close()
-
-    # Get statewide baseline
+    # Calculate PVI for each year against the statewide baseline
     statewide = get_statewide_baseline()
-
-    # Calculate PVI for each year
-    pvi_by_year = {}
-    years = sorted(town_by_year.keys())
-
-    for year in years:
-        town_data = town_by_year[year]
-        state_data = statewide.get(year)
-
-        if town_data['total'] > 0 and state_data:
-            town_r_pct = (town_data['r_votes'] / town_data['total']) * 100
-            state_r_pct = state_data['r_pct']
-            pvi = town_r_pct - state_r_pct
-
-            pvi_by_year[year] = {
-                'pvi': round(pvi, 1),
-                'town_r_pct': round(town_r_pct, 1),
-                'state_r_pct': round(state_r_pct, 1),
-                'competitive_races': town_data['races']
-            }
+    pvi_by_year, years = _pvi_by_year(
+        town_by_year, {yr: data['r_pct'] for yr, data in statewide.items()}, 'town_r_pct')
+    for year, year_pvi in pvi_by_year.items():
+        year_pvi['competitive_races'] = town_by_year[year][2]
 
     # Calculate trend
     if len(years) >= 2 and years[0] in pvi_by_year and years[-1] in pvi_by_year:
@@ -1054,104 +1058,58 @@ def get_town_pvi(town):
     }
 
 
-def get_towns_in_district(office, district, county=None):
-    """Get the towns currently in a district (using most recent year's data)."""
+@db_cached()
+def _latest_general_year():
+    """Most recent general election year."""
     conn = get_connection()
-    cursor = conn.cursor()
-
-    if county:
-        # County-based district
-        cursor.execute("""
-            SELECT DISTINCT res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = ?
-            AND r.district = ?
-            AND r.county = ?
-            AND e.year = (SELECT MAX(e2.year) FROM elections e2 WHERE e2.election_type = 'general')
-            AND res.municipality NOT GLOB '[0-9]*'
-            AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
-            ORDER BY res.municipality
-        """, (office, district, county))
-    else:
-        # Statewide district
-        cursor.execute("""
-            SELECT DISTINCT res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = ?
-            AND r.district = ?
-            AND e.year = (SELECT MAX(e2.year) FROM elections e2 WHERE e2.election_type = 'general')
-            AND res.municipality NOT GLOB '[0-9]*'
-            AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
-            ORDER BY res.municipality
-        """, (office, district))
-
-    towns = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return towns
+    row = conn.execute("SELECT MAX(year) FROM elections WHERE election_type = 'general'").fetchone()
+    return row[0]
 
 
-def get_district_pvi(office, district, county=None):
+@db_cached()
+def _statewide_contested_by_year():
     """
-    Calculate PVI for a district based on CURRENT district composition.
-    PVI = (R votes in district towns from contested races) / (R+D votes in district towns)
-        - (R votes statewide from contested races) / (R+D votes statewide)
+    Statewide two-party R% by year across contested races (R and D both ran).
+    Used as the PVI baseline for districts.
     """
-    # First, get the towns currently in this district
-    towns = get_towns_in_district(office, district, county)
-
-    if not towns:
-        return {
-            'current_pvi': 0,
-            'pvi_by_year': {},
-            'years': [],
-            'trend': 0,
-            'towns': []
-        }
-
     conn = get_connection()
     cursor = conn.cursor()
-
-    placeholders = ','.join('?' * len(towns))
-
-    # Get R/D votes by year for contested races only, summed for district towns
-    cursor.execute(f"""
+    cursor.execute("""
         WITH race_totals AS (
-            SELECT e.year, r.id as race_id, res.municipality,
+            SELECT e.year, r.id as race_id,
                    SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r,
                    SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d
             FROM results res
             JOIN candidates c ON res.candidate_id = c.id
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
-            WHERE res.municipality IN ({placeholders})
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY e.year, r.id, res.municipality
-        ),
-        contested AS (
-            SELECT year, municipality, r, d
-            FROM race_totals
-            WHERE r > 0 AND d > 0
+            WHERE e.election_type = 'general'
+            AND c.is_real = 1
+            GROUP BY e.year, r.id
+            HAVING r > 0 AND d > 0
         )
-        SELECT year, SUM(r) as r, SUM(d) as d
-        FROM contested
+        SELECT year, SUM(r) as total_r, SUM(d) as total_d
+        FROM race_totals
         GROUP BY year
-    """, towns)
+    """)
+    statewide = {}
+    for year, total_r, total_d in cursor:
+        statewide[year] = total_r / (total_r + total_d) * 100
+    return statewide
 
-    district_by_year = {}
-    for year, r, d in cursor.fetchall():
-        district_by_year[year] = {'r_votes': r, 'd_votes': d, 'total': r + d}
 
-    # Get statewide baseline for all contested races
+@db_cached()
+def _town_contested_by_year():
+    """
+    Two-party votes by town and year: {town: {year: (r, d)}}, summed over
+    races where both R and D got votes in that town. District PVIs are sums
+    of these per-town totals, so one aggregation serves every district.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
     cursor.execute("""
         WITH race_totals AS (
-            SELECT e.year, r.id as race_id,
+            SELECT e.year, r.id as race_id, res.municipality,
                    SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r,
                    SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d
             FROM results res
@@ -1159,38 +1117,75 @@ def get_district_pvi(office, district, county=None):
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY e.year, r.id
+            AND c.is_real = 1
+            GROUP BY e.year, r.id, res.municipality
             HAVING r > 0 AND d > 0
         )
-        SELECT year, SUM(r) as total_r, SUM(d) as total_d
+        SELECT municipality, year, SUM(r), SUM(d)
         FROM race_totals
-        GROUP BY year
+        GROUP BY municipality, year
     """)
-    statewide = {}
-    for year, total_r, total_d in cursor.fetchall():
-        statewide[year] = {'r_pct': total_r / (total_r + total_d) * 100}
+    by_town = defaultdict(dict)
+    for town, year, r, d in cursor:
+        by_town[town][year] = (r, d)
+    return dict(by_town)
 
-    conn.close()
 
-    # Calculate PVI for each year
-    pvi_by_year = {}
-    years = sorted(district_by_year.keys())
+@db_cached(maxsize=1024)
+def get_towns_in_district(office, district, county=None):
+    """Get the towns currently in a district (using most recent year's data)."""
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    for year in years:
-        dist_data = district_by_year[year]
-        state_data = statewide.get(year)
+    if county:
+        # County-based district
+        cursor.execute("""
+            SELECT town FROM current_district_towns
+            WHERE office = ? AND district = ? AND county = ?
+            ORDER BY town
+        """, (office, district, county))
+    else:
+        # Statewide district
+        cursor.execute("""
+            SELECT DISTINCT town FROM current_district_towns
+            WHERE office = ? AND district = ?
+            ORDER BY town
+        """, (office, district))
 
-        if dist_data['total'] > 0 and state_data:
-            dist_r_pct = (dist_data['r_votes'] / dist_data['total']) * 100
-            state_r_pct = state_data['r_pct']
-            pvi = dist_r_pct - state_r_pct
+    towns = [town for (town,) in cursor]
+    return towns
 
-            pvi_by_year[year] = {
-                'pvi': round(pvi, 1),
-                'dist_r_pct': round(dist_r_pct, 1),
-                'state_r_pct': round(state_r_pct, 1)
-            }
+
+def get_district_pvi(office, district, county=None):
+    """
+    Calculate PVI for a district based on CURRENT district composition.
+    PVI = (R votes in district towns from contested races) / (R+D votes in district towns)
+        - (R votes statewide from contested races) / (R+D votes statewide)
+    """
+    # First, get the towns currently in this district
+    towns = get_towns_in_district(office, district, county)
+
+    if not towns:
+        return {
+            'current_pvi': 0,
+            'pvi_by_year': {},
+            'years': [],
+            'trend': 0,
+            'towns': []
+        }
+
+    # Sum the district towns' contested-race R and R+D votes by year
+    town_votes = _town_contested_by_year()
+    district_by_year = defaultdict(lambda: [0, 0])
+    for town in towns:
+        for year, (r, d) in town_votes.get(town, {}).items():
+            totals = district_by_year[year]
+            totals[0] += r
+            totals[1] += r + d
+
+    # Calculate PVI for each year against all contested races statewide
+    pvi_by_year, years = _pvi_by_year(
+        district_by_year, _statewide_contested_by_year(), 'dist_r_pct')
 
     # Calculate trend (2022 → 2024)
     if 2022 in pvi_by_year and 2024 in pvi_by_year:
@@ -1221,9 +1216,9 @@ def get_district_topline_races(office, district, county=None):
     conn = get_connection()
     cursor = conn.cursor()
 
-    placeholders = ','.join('?' * len(towns))
-
-    cursor.execute(f"""
+    # Fixed SQL text (no per-district IN list), so the prepared statement is
+    # reused from the connection's statement cache
+    cursor.execute("""
         SELECT
             e.year,
             o.name as office,
@@ -1234,16 +1229,20 @@ def get_district_topline_races(office, district, county=None):
         JOIN races r ON res.race_id = r.id
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
-        WHERE res.municipality IN ({placeholders})
+        WHERE res.municipality IN (
+            SELECT town FROM current_district_towns
+            WHERE office = ?1 AND district = ?2
+            AND (?3 IS NULL OR county = ?3)
+        )
         AND e.election_type = 'general'
         AND o.name IN ('President of the United States', 'Governor')
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY e.year, o.name
         ORDER BY e.year DESC
-    """, towns)
+    """, (office, district, county or None))
 
     results = {}
-    for year, off, r, d in cursor.fetchall():
+    for year, off, r, d in cursor:
         if year not in results:
             results[year] = {}
         total = r + d
@@ -1255,7 +1254,6 @@ def get_district_topline_races(office, district, county=None):
                 'margin': round(margin, 1)
             }
 
-    conn.close()
     return results
 
 
@@ -1270,72 +1268,53 @@ def get_town_key_races(town):
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Get individual candidate results by office and year
-    cursor.execute("""
+    # Top vote-getter per party for each key office and year
+    cursor.execute(f"""
         SELECT
-            e.year,
-            o.name as office,
-            c.party,
-            SUM(res.votes) as votes
-        FROM results res
-        JOIN candidates c ON res.candidate_id = c.id
-        JOIN races r ON res.race_id = r.id
-        JOIN elections e ON r.election_id = e.id
-        JOIN offices o ON r.office_id = o.id
-        WHERE res.municipality = ?
-        AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        AND c.party IN ('Republican', 'Democratic')
-        GROUP BY e.year, o.name, c.name, c.party
-        ORDER BY e.year, o.name, votes DESC
-    """, (town,))
-
-    # Group by year/office and find top vote-getter per party
-    race_candidates = defaultdict(list)
-    for row in cursor.fetchall():
-        year, office, party, votes = row
-        race_candidates[(year, office)].append({'party': party, 'votes': votes})
+            year,
+            office,
+            MAX(CASE WHEN party = 'Republican' THEN votes ELSE 0 END) as top_r,
+            MAX(CASE WHEN party = 'Democratic' THEN votes ELSE 0 END) as top_d
+        FROM (
+            SELECT
+                e.year,
+                o.name as office,
+                c.party,
+                SUM(res.votes) as votes
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE res.municipality = ?
+            AND e.election_type = 'general'
+            AND o.name IN ({','.join('?' * len(KEY_OFFICES))})
+            AND c.is_real = 1
+            AND c.party IN ('Republican', 'Democratic')
+            GROUP BY e.year, o.name, c.name, c.party
+        )
+        GROUP BY year, office
+        ORDER BY year, office
+    """, (town, *KEY_OFFICES))
 
-    results = {}
+    results = defaultdict(dict)
     years = set()
 
-    for (year, office), candidates in race_candidates.items():
-        # Find top Republican and top Democrat
-        top_r = max((c['votes'] for c in candidates if c['party'] == 'Republican'), default=0)
-        top_d = max((c['votes'] for c in candidates if c['party'] == 'Democratic'), default=0)
-
+    for year, office, top_r, top_d in cursor:
         total = top_r + top_d
         if total > 0:
             margin = round((top_r - top_d) / total * 100, 1)
         else:
             margin = 0
 
-        if office not in results:
-            results[office] = {}
         results[office][year] = margin
         years.add(year)
 
-    conn.close()
-
-    # Define key offices to show (in order)
-    key_offices = [
-        'President of the United States',
-        'Governor',
-        'United States Senator',
-        'Representative in Congress',
-        'Executive Councilor',
-        'State Senator',
-        'State Representative'
-    ]
-
-    # Filter to only key offices that have data
-    filtered = {}
-    for office in key_offices:
-        if office in results:
-            filtered[office] = results[office]
+    # Key offices that have data, in display order
+    by_office = {office: results[office] for office in KEY_OFFICES if office in results}
 
     return {
-        'by_office': filtered,
+        'by_office': by_office,
         'years': sorted(years, reverse=True)
     }
 
@@ -1345,6 +1324,7 @@ def get_town_representation(town):
     Get the current districts this town is in (most recent year).
     Returns list of district assignments.
     """
+    latest_year = _latest_general_year()
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -1359,21 +1339,19 @@ def get_town_representation(town):
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE res.municipality = ?
-        AND e.year = (SELECT MAX(e2.year) FROM elections e2 WHERE e2.election_type = 'general')
+        AND e.year = ?
         AND o.name IN ('State Representative', 'State Senator', 'Executive Councilor', 'Representative in Congress')
-        ORDER BY o.name
-    """, (town,))
+        ORDER BY o.name, CAST(r.district AS INTEGER), r.district
+    """, (town, latest_year))
 
     districts = []
-    for row in cursor.fetchall():
-        office, district, county = row
+    for office, district, county in cursor:
         districts.append({
             'office': office,
             'district': district,
             'county': county
         })
 
-    conn.close()
     return districts
 
 
@@ -1387,32 +1365,40 @@ def get_turnout_analysis():
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Get turnout by town and year from voter_registration table (ballots_cast)
+    # Get turnout by town and year from voter_registration table (ballots_cast).
+    # City wards are summed into their base town; a town listed more than once
+    # in a year counts only its latest row.
     cursor.execute("""
+        WITH ballots AS (
+            SELECT
+                v.municipality,
+                instr(v.municipality, ' Ward ') as ward_at,
+                e.year,
+                v.ballots_cast,
+                ROW_NUMBER() OVER (
+                    PARTITION BY v.municipality, e.year ORDER BY v.id DESC
+                ) as latest
+            FROM voter_registration v
+            JOIN elections e ON v.election_id = e.id
+            WHERE e.election_type = 'general'
+            AND v.ballots_cast > 0
+            AND v.municipality != ''
+        )
         SELECT
-            v.municipality as town,
-            e.year,
-            v.ballots_cast
-        FROM voter_registration v
-        JOIN elections e ON v.election_id = e.id
-        WHERE e.election_type = 'general'
-        AND v.ballots_cast > 0
-        ORDER BY v.municipality, e.year
+            CASE WHEN ward_at > 0 THEN substr(municipality, 1, ward_at - 1)
+                ELSE municipality
+            END as town,
+            year,
+            SUM(ballots_cast)
+        FROM ballots
+        WHERE ward_at > 0 OR latest = 1
+        GROUP BY town, year
+        ORDER BY town, year
     """)
 
     town_turnout = defaultdict(dict)
-    for row in cursor.fetchall():
-        town, year, ballots = row
-        if not town:
-            continue
-        # Normalize ward names to town names
-        if ' Ward ' in town:
-            base_town = town[:town.index(' Ward ')]
-            if base_town not in town_turnout or year not in town_turnout[base_town]:
-                town_turnout[base_town][year] = 0
-            town_turnout[base_town][year] += ballots
-        else:
-            town_turnout[town][year] = ballots
+    for town, year, ballots in cursor:
+        town_turnout[town][year] = ballots
 
     # Calculate changes
     years = [2016, 2018, 2020, 2022, 2024]
@@ -1440,8 +1426,6 @@ def get_turnout_analysis():
         total = sum(by_year.get(year, 0) for by_year in town_turnout.values())
         statewide[year] = total
 
-    conn.close()
-
     return {
         'by_town': dict(town_turnout),
         'biggest_gains': biggest_gains,
@@ -1475,13 +1459,12 @@ def get_redistricting_impact():
         WHERE e.year = 2020
         AND e.election_type = 'general'
         AND o.name = 'State Representative'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY r.county, r.district
     """)
 
     pre_2022 = {}
-    for row in cursor.fetchall():
-        county, district, office, r_votes, d_votes = row
+    for county, district, office, r_votes, d_votes in cursor:
         key = f"{county}-{district}"
         total = r_votes + d_votes
         margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
@@ -1503,20 +1486,17 @@ def get_redistricting_impact():
         WHERE e.year = 2024
         AND e.election_type = 'general'
         AND o.name = 'State Representative'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY r.county, r.district
     """)
 
     post_2022 = {}
-    for row in cursor.fetchall():
-        county, district, office, r_votes, d_votes = row
+    for county, district, office, r_votes, d_votes in cursor:
         key = f"{county}-{district}"
         total = r_votes + d_votes
         margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
         post_2022[key] = {'margin': round(margin, 1), 'r_votes': r_votes, 'd_votes': d_votes}
 
-    conn.close()
-
     # Note: Direct comparison is difficult because district boundaries changed
     # Instead, show new districts and their composition
 
@@ -1528,6 +1508,7 @@ def get_redistricting_impact():
     }
 
 
+@db_cached(maxsize=16)
 def get_office_results(office):
     """
     Get comprehensive results for a specific office across all years.
@@ -1554,7 +1535,7 @@ def get_office_results(office):
         JOIN offices o ON r.office_id = o.id
         WHERE o.name = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY e.year, r.id, c.id
         ORDER BY e.year DESC, r.county, r.district, total_votes DESC
     """, (office,))
@@ -1562,22 +1543,25 @@ def get_office_results(office):
     by_year = defaultdict(lambda: {'races': [], 'r_seats': 0, 'd_seats': 0, 'total_r_votes': 0, 'total_d_votes': 0})
     current_race = None
 
-    for row in cursor.fetchall():
-        year, district, county, seats, candidate, party, votes, rank = row
+    # Rows arrive grouped by year and race, so the current year's dict and
+    # race's candidate list are only looked up when they change
+    for year, district, county, seats, candidate, party, votes, rank in cursor:
         race_key = (year, district, county)
 
         if race_key != current_race:
             current_race = race_key
-            by_year[year]['races'].append({
+            year_data = by_year[year]
+            race_candidates = []
+            year_data['races'].append({
                 'district': district,
                 'county': county,
                 'seats': seats,
-                'candidates': []
+                'candidates': race_candidates
             })
 
-        race = by_year[year]['races'][-1]
+        party = _intern(party)
         is_winner = rank <= seats
-        race['candidates'].append({
+        race_candidates.append({
             'name': candidate,
             'party': party,
             'votes': votes,
@@ -1585,16 +1569,14 @@ def get_office_results(office):
         })
 
         # Sum ALL votes for each party (counts every vote cast)
-        if party == 'Republican':
-            by_year[year]['total_r_votes'] += votes
+        if party is _R:
+            year_data['total_r_votes'] += votes
             if is_winner:
-                by_year[year]['r_seats'] += 1
-        elif party == 'Democratic':
-            by_year[year]['total_d_votes'] += votes
+                year_data['r_seats'] += 1
+        elif party is _D:
+            year_data['total_d_votes'] += votes
             if is_winner:
-                by_year[year]['d_seats'] += 1
-
-    conn.close()
+                year_data['d_seats'] += 1
 
     # Calculate margins per year
     for year, data in by_year.items():
@@ -1635,7 +1617,7 @@ def get_office_year_results(office, year):
         WHERE o.name = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY r.id, c.id
         ORDER BY r.county, CAST(r.district AS INTEGER), total_votes DESC
     """, (office, year))
@@ -1643,8 +1625,7 @@ def get_office_year_results(office, year):
     races = []
     current_race = None
 
-    for row in cursor.fetchall():
-        district, county, seats, candidate, party, votes, rank = row
+    for district, county, seats, candidate, party, votes, rank in cursor:
         race_key = (district, county)
 
         if race_key != current_race:
@@ -1686,15 +1667,12 @@ def get_office_year_results(office, year):
         """, (cycle,))
 
         district_towns = {}
-        for row in cursor.fetchall():
-            county, district, town = row
+        for county, district, town in cursor:
             key = (county, district)
             if key not in district_towns:
                 district_towns[key] = []
             district_towns[key].append(town)
 
-    conn.close()
-
     # Calculate margin for each race and add towns
     for race in races:
         total = race['top_r'] + race['top_d']
@@ -1714,6 +1692,15 @@ def get_office_year_results(office, year):
     return races
 
 
+@lru_cache(maxsize=8192)
+def _extract_lastname(name):
+    """Extract last name from full name or return as-is if already just last name."""
+    if not name:
+        return ''
+    parts = name.split()
+    return parts[-1].upper() if parts else name.upper()
+
+
 def get_incumbent_analysis():
     """
     Track incumbents - candidates who won in year N and ran again in year N+2.
@@ -1723,13 +1710,6 @@ def get_incumbent_analysis():
     conn = get_connection()
     cursor = conn.cursor()
 
-    def extract_lastname(name):
-        """Extract last name from full name or return as-is if already just last name."""
-        if not name:
-            return ''
-        parts = name.split()
-        return parts[-1].upper() if parts else name.upper()
-
     # Get all race results with winner determination
     cursor.execute("""
         WITH candidate_totals AS (
@@ -1749,7 +1729,7 @@ def get_incumbent_analysis():
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND o.name IN ('State Representative', 'State Senator', 'Executive Councilor', 'Governor')
             GROUP BY c.name, c.party, e.year, o.name, r.id, r.district, r.county, r.seats
         ),
@@ -1782,11 +1762,11 @@ def get_incumbent_analysis():
 
     # Organize results by year
     results_by_year = defaultdict(list)
-    for row in cursor.fetchall():
-        candidate, party, year, office, district, county, votes, won = row
+    for candidate, party, year, office, district, county, votes, won in cursor:
         results_by_year[year].append({
             'name': candidate,
-            'lastname': extract_lastname(candidate),
+            'name_upper': candidate.upper(),
+            'lastname': _extract_lastname(candidate),
             'party': party,
             'office': office,
             'district': district,
@@ -1795,8 +1775,6 @@ def get_incumbent_analysis():
             'won': bool(won)
         })
 
-    conn.close()
-
     def find_incumbents(prev_year, curr_year):
         """Find incumbents: won in prev_year and ran in curr_year."""
         if prev_year not in results_by_year or curr_year not in results_by_year:
@@ -1814,7 +1792,7 @@ def get_incumbent_analysis():
                     key = (r['lastname'], r['district'], r['county'], r['party'])
                     prev_winners_rep[key] = r
                 else:
-                    key = (r['name'].upper(), r['party'])
+                    key = (r['name_upper'], r['party'])
                     prev_winners_other[key] = r
 
         # Find matches in curr_year
@@ -1825,7 +1803,7 @@ def get_incumbent_analysis():
                 key = (r['lastname'], r['district'], r['county'], r['party'])
                 prev_race = prev_winners_rep.get(key)
             else:
-                key = (r['name'].upper(), r['party'])
+                key = (r['name_upper'], r['party'])
                 prev_race = prev_winners_other.get(key)
 
             if prev_race:
@@ -1847,7 +1825,7 @@ def get_incumbent_analysis():
     incumbents_2022 = find_incumbents(2020, 2022)
     incumbents_2020 = find_incumbents(2018, 2020)
 
-    # Build repeat candidates list (for display)
+    # Build repeat candidates list (for display), stopping at the limit
     repeat_candidates = []
     seen = set()
     for year in sorted(results_by_year.keys(), reverse=True):
@@ -1862,8 +1840,10 @@ def get_incumbent_analysis():
                     'district': r['district'],
                     'county': r['county']
                 })
-
-    repeat_candidates = repeat_candidates[:100]  # Limit
+                if len(repeat_candidates) == 100:
+                    break
+        if len(repeat_candidates) == 100:
+            break
 
     # Calculate incumbent stats
     inc_2024_won = sum(1 for i in incumbents_2024 if i['won_reelection'])
@@ -1877,7 +1857,7 @@ def get_incumbent_analysis():
     incumbents_2024.sort(key=lambda x: (x['won_reelection'], x['name']))
 
     return {
-        'repeat_candidates': repeat_candidates[:100],
+        'repeat_candidates': repeat_candidates,
         'total_repeat': len(repeat_candidates),
         'incumbents_2024': incumbents_2024,
         'incumbents_won_2024': inc_2024_won,
@@ -1919,590 +1899,313 @@ def compare_districts(district1, district2):
     return None
 
 
-def get_districts_map_data(year=None, metric='margin'):
-    """
-    Get district data keyed by district code for the map.
+def _sum_town_votes(town_votes, towns):
+    """Total (r, d) from a {town: (r, d)} dict over a district's towns."""
+    r_votes = d_votes = 0
+    for t in towns:
+        votes = town_votes.get(t)
+        if votes:
+            r_votes += votes[0]
+            d_votes += votes[1]
+    return r_votes, d_votes
 
-    Args:
-        year: Election year (2016, 2018, 2020, 2022, 2024) or None for average
-        metric: 'margin' for vote margin, 'pvi' for partisan lean
 
-    Returns data for all district types:
-    - House: BE1, HI35, etc.
-    - Senate: sen_1, sen_2, etc.
-    - Exec Council: ec_1, ec_2, etc.
-    - Congress: cong_1, cong_2
-    - Towns: town names
-    """
-    conn = get_connection()
-    cursor = conn.cursor()
+def _current_district_towns(cursor, office):
+    """(county, district, town) rows for an office's current districts, wards folded into towns."""
+    cursor.execute("""
+        SELECT county, district, town FROM current_district_towns
+        WHERE office = ?
+    """, (office,))
+    return [(county, district, town.partition(' Ward ')[0]) for county, district, town in cursor]
 
-    data = {}
 
-    # County code mapping for House districts
-    county_codes = {
-        'Belknap': 'BE', 'Carroll': 'CA', 'Cheshire': 'CH',
-        'Coos': 'CO', 'Grafton': 'GR', 'Hillsborough': 'HI',
-        'Merrimack': 'ME', 'Rockingham': 'RO', 'Strafford': 'ST', 'Sullivan': 'SU'
-    }
+# District offices drawn on the districts map, with their map key prefix
+DISTRICT_OFFICES = (('State Senator', 'sen'),
+                    ('Executive Councilor', 'ec'),
+                    ('Representative in Congress', 'cong'))
 
-    # Determine years to query
-    if year:
-        years = [int(year)]
-        year_clause = f"e.year = {year}"
-    else:
-        years = [2016, 2018, 2020, 2022, 2024]
-        year_clause = f"e.year IN ({','.join(str(y) for y in years)})"
 
-    # House districts - need special handling for multi-seat
-    # For average (year=None), use current district boundaries with historical town data
+def _district_office_map_data(cursor, office, prefix, year):
+    """
+    Map data for one Senate/Executive Council/Congress office, keyed
+    '{prefix}_{district}'. With no year, margins apply all historical town
+    votes to the current (2024) district boundaries; with a year, they come
+    from that year's results, with the top two candidates for display.
+    """
+    data = {}
+
     if not year:
-        # Get current (2024) district-to-town mapping for base districts
-        cursor.execute("""
-            SELECT DISTINCT r.county, r.district, res.municipality
+        # Get current (2024) district-to-town mapping
+        district_towns = defaultdict(set)
+        for _county, district, town in _current_district_towns(cursor, office):
+            district_towns[district].add(town)
+
+        # Get all historical votes by town
+        cursor.execute(f"""
+            SELECT
+                {BASE_TOWN_SQL} as town,
+                SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
+                SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes
             FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
             JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
             JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'State Representative'
-            AND e.year = 2024
+            JOIN offices o ON r.office_id = o.id
+            WHERE o.name = ?
+            AND e.election_type = 'general'
+            AND c.is_real = 1
             AND res.municipality IS NOT NULL
-            AND res.municipality != ''
-            AND r.district NOT LIKE '%F%'
-        """)
-        house_district_towns = defaultdict(set)
-        house_district_seats = {}
-        for county, district, muni in cursor.fetchall():
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                if ' Ward ' in muni:
-                    muni = muni[:muni.index(' Ward ')]
-                house_district_towns[code].add(muni)
-
-        # Get seat counts from 2024
-        cursor.execute("""
-            SELECT r.county, r.district, r.seats
-            FROM races r
-            JOIN offices o ON r.office_id = o.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'State Representative'
-            AND e.year = 2024
-            AND r.district NOT LIKE '%F%'
-        """)
-        for county, district, seats in cursor.fetchall():
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                house_district_seats[code] = seats or 1
-
-        # Get all historical House votes by town using TOP vote-getter per party per race
-        # This is fair for multi-member races where one party may run more candidates
-        cursor.execute("""
-            SELECT
-                res.municipality,
-                r.id as race_id,
-                c.party,
-                SUM(res.votes) as votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Representative'
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            AND res.municipality IS NOT NULL
-            AND c.party IN ('Republican', 'Democratic')
-            GROUP BY res.municipality, r.id, c.name, c.party
-        """)
-
-        # Group by town and race, then find top vote-getter per party
-        town_race_candidates = defaultdict(lambda: defaultdict(list))
-        for muni, race_id, party, votes in cursor.fetchall():
-            if ' Ward ' in muni:
-                base = muni[:muni.index(' Ward ')]
-            else:
-                base = muni
-            town_race_candidates[base][race_id].append({'party': party, 'votes': votes})
-
-        # Calculate total using top vote-getter per party per race
-        house_town_votes = defaultdict(lambda: {'r': 0, 'd': 0})
-        for town, races in town_race_candidates.items():
-            for race_id, candidates in races.items():
-                top_r = max((c['votes'] for c in candidates if c['party'] == 'Republican'), default=0)
-                top_d = max((c['votes'] for c in candidates if c['party'] == 'Democratic'), default=0)
-                house_town_votes[town]['r'] += top_r
-                house_town_votes[town]['d'] += top_d
+            GROUP BY town
+        """, (office,))
+        town_votes = {town: (r_votes, d_votes) for town, r_votes, d_votes in cursor}
 
         # Calculate margin for each current district using historical town data
-        for code, towns in house_district_towns.items():
-            r_votes = sum(house_town_votes[t]['r'] for t in towns)
-            d_votes = sum(house_town_votes[t]['d'] for t in towns)
+        for district, towns in district_towns.items():
+            r_votes, d_votes = _sum_town_votes(town_votes, towns)
             total = r_votes + d_votes
             margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            seats = house_district_seats.get(code, 1)
-            data[code] = {
+            data[f'{prefix}_{district}'] = {
                 'margin': round(margin, 1),
                 'r_votes': r_votes,
                 'd_votes': d_votes,
-                'total_votes': total,
-                'seats': seats,
-                'r_seats': seats if margin > 0 else 0,  # Approximate for average
-                'd_seats': seats if margin < 0 else 0
+                'total_votes': total
             }
+        return data
 
-        # Floterial districts - same approach
-        cursor.execute("""
-            SELECT DISTINCT r.county, r.district, res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'State Representative'
-            AND e.year = 2024
-            AND res.municipality IS NOT NULL
-            AND res.municipality != ''
-            AND r.district LIKE '%F%'
-        """)
-        floterial_district_towns = defaultdict(set)
-        for county, district, muni in cursor.fetchall():
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                if ' Ward ' in muni:
-                    muni = muni[:muni.index(' Ward ')]
-                floterial_district_towns[code].add(muni)
+    # Specific year - get candidate-level data for display
+    cursor.execute("""
+        SELECT
+            r.district,
+            c.name as candidate_name,
+            c.party,
+            SUM(res.votes) as votes
+        FROM results res
+        JOIN candidates c ON res.candidate_id = c.id
+        JOIN races r ON res.race_id = r.id
+        JOIN elections e ON r.election_id = e.id
+        JOIN offices o ON r.office_id = o.id
+        WHERE o.name = ?
+        AND e.year = ?
+        AND e.election_type = 'general'
+        AND c.is_real = 1
+        GROUP BY r.district, c.name, c.party
+        ORDER BY r.district, votes DESC
+    """, (office, year))
 
-        # Get floterial seat counts from 2024
-        cursor.execute("""
-            SELECT r.county, r.district, r.seats
-            FROM races r
-            JOIN offices o ON r.office_id = o.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'State Representative'
-            AND e.year = 2024
-            AND r.district LIKE '%F%'
-        """)
-        floterial_seats = {}
-        for county, district, seats in cursor.fetchall():
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                floterial_seats[code] = seats or 1
+    district_candidates = defaultdict(list)
+    for district, candidate_name, party, votes in cursor:
+        district_candidates[district].append({
+            'name': candidate_name,
+            'party': party[0] if party else '?',  # R or D
+            'votes': votes
+        })
 
-        for code, towns in floterial_district_towns.items():
-            r_votes = sum(house_town_votes[t]['r'] for t in towns)
-            d_votes = sum(house_town_votes[t]['d'] for t in towns)
-            total = r_votes + d_votes
-            margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            seats = floterial_seats.get(code, 1)
-            data[code] = {
-                'margin': round(margin, 1),
-                'r_votes': r_votes,
-                'd_votes': d_votes,
-                'total_votes': total,
-                'seats': seats,
-                'r_seats': seats if margin > 0 else 0,
-                'd_seats': seats if margin < 0 else 0
-            }
-    else:
-        # Specific year - use that year's data directly
-        # First get seat counts
-        cursor.execute(f"""
-            SELECT r.county, r.district, r.seats
-            FROM races r
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Representative'
-            AND {year_clause}
-            AND e.election_type = 'general'
-        """)
-        district_seats = {}
-        for county, district, seats in cursor.fetchall():
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                district_seats[code] = seats or 1
+    for district, candidates in district_candidates.items():
+        r_votes = d_votes = total = 0
+        for c in candidates:
+            votes = c['votes']
+            total += votes
+            if c['party'] == 'R':
+                r_votes += votes
+            elif c['party'] == 'D':
+                d_votes += votes
+        margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
+        data[f'{prefix}_{district}'] = {
+            'margin': round(margin, 1),
+            'r_votes': r_votes,
+            'd_votes': d_votes,
+            'total_votes': total,
+            # Top 2 candidates for display
+            'candidates': candidates[:2]
+        }
 
-        cursor.execute(f"""
-            SELECT
-                r.county,
-                r.district,
-                c.name as candidate_name,
-                c.party,
-                SUM(res.votes) as votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Representative'
-            AND {year_clause}
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY r.county, r.district, c.name, c.party
-            ORDER BY r.county, r.district, votes DESC
-        """)
+    return data
 
-        # Group candidates by district
-        district_candidates = defaultdict(list)
-        for row in cursor.fetchall():
-            county, district, candidate_name, party, votes = row
-            if county in county_codes:
-                code = county_codes[county] + str(district)
-                district_candidates[code].append({
-                    'name': candidate_name,
-                    'party': party,
-                    'votes': votes
-                })
 
-        # Process each district - use actual seat count from database
-        for code, candidates in district_candidates.items():
-            # Sort by votes descending
-            candidates.sort(key=lambda x: -x['votes'])
+def _district_office_pvi(cursor, office, prefix, muni_votes, statewide_r_pct):
+    """
+    PVI for each of an office's districts, keyed '{prefix}_{district}', from
+    the competitive votes of every municipality the office has ever covered.
+    """
+    cursor.execute("""
+        SELECT DISTINCT
+            r.district,
+            res.municipality
+        FROM results res
+        JOIN races r ON res.race_id = r.id
+        JOIN offices o ON r.office_id = o.id
+        WHERE o.name = ?
+        AND res.municipality IS NOT NULL
+        AND res.municipality NOT GLOB '[0-9]*'
+    """, (office,))
 
-            # Count R and D candidates
-            r_candidates = [c for c in candidates if c['party'] == 'Republican']
-            d_candidates = [c for c in candidates if c['party'] == 'Democratic']
+    district_munis = defaultdict(set)
+    for district, muni in cursor:
+        # Keep full municipality name (including ward info) for accurate PVI
+        district_munis[f'{prefix}_{district}'].add(muni)
 
-            # Use actual seat count from database
-            num_seats = district_seats.get(code, 1)
-            if len(candidates) == 0:
-                continue
+    pvis = {}
+    for code, munis in district_munis.items():
+        district_r = sum(muni_votes[m]['r'] for m in munis)
+        district_total = sum(muni_votes[m]['total'] for m in munis)
+        if district_total > 0:
+            district_r_pct = district_r / district_total * 100
+            pvis[code] = round(district_r_pct - statewide_r_pct, 1)
+    return pvis
 
-            # Get winners (top N vote-getters)
-            winners = candidates[:num_seats]
-            r_winners = sum(1 for w in winners if w['party'] == 'Republican')
-            d_winners = sum(1 for w in winners if w['party'] == 'Democratic')
-
-            # Calculate votes using TOP vote-getter per party (fair for multi-member)
-            top_r = max((c['votes'] for c in r_candidates), default=0)
-            top_d = max((c['votes'] for c in d_candidates), default=0)
-            total_votes = sum(c['votes'] for c in candidates)
 
-            if num_seats > 1 and len(candidates) > num_seats:
-                # Multi-seat: use threshold margin (last winner vs first loser)
-                last_winner = candidates[num_seats - 1]
-                first_loser = candidates[num_seats]
-                threshold_total = last_winner['votes'] + first_loser['votes']
-                if threshold_total > 0:
-                    # Positive if R would gain seat, negative if D would gain seat
-                    if last_winner['party'] == 'Republican':
-                        # R holds the last seat - margin is R advantage
-                        margin = (last_winner['votes'] - first_loser['votes']) / threshold_total * 100
-                    elif last_winner['party'] == 'Democratic':
-                        # D holds the last seat - margin is D advantage (negative)
-                        margin = -(last_winner['votes'] - first_loser['votes']) / threshold_total * 100
-                    else:
-                        margin = 0
-                else:
-                    margin = 0
-            else:
-                # Single seat or no losers: use top vote-getter margin
-                rd_total = top_r + top_d
-                margin = ((top_r - top_d) / rd_total * 100) if rd_total > 0 else 0
+@db_cached(maxsize=16)
+def get_districts_map_data(year=None, metric='margin'):
+    """
+    Get district data keyed by district code for the map.
 
-            # For State House, include top candidates for display
-            top_candidates = []
-            for c in candidates[:min(4, num_seats * 2)]:  # Top candidates up to 2x seats
-                top_candidates.append({
-                    'name': c['name'],
-                    'party': c['party'][0] if c['party'] else '?',
-                    'votes': c['votes']
-                })
+    Args:
+        year: Election year (2016, 2018, 2020, 2022, 2024) or None for average
+        metric: 'margin' for vote margin, 'pvi' for partisan lean
 
-            data[code] = {
-                'margin': round(margin, 1),
-                'r_votes': top_r,
-                'd_votes': top_d,
-                'total_votes': total_votes,
-                'seats': num_seats,
-                'r_seats': r_winners,
-                'd_seats': d_winners,
-                'candidates': top_candidates if year else None  # Only include for specific year
-            }
+    Returns data for all district types:
+    - House: BE1, HI35, etc.
+    - Senate: sen_1, sen_2, etc.
+    - Exec Council: ec_1, ec_2, etc.
+    - Congress: cong_1, cong_2
+    - Towns: town names
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    # Senate districts
-    # For average (year=None), use current district boundaries with historical town data
-    if not year:
-        # Get current (2024) district-to-town mapping
-        cursor.execute("""
-            SELECT DISTINCT r.district, res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'State Senator'
-            AND e.year = 2024
-            AND res.municipality IS NOT NULL
-            AND res.municipality != ''
-        """)
-        sen_district_towns = defaultdict(set)
-        for district, muni in cursor.fetchall():
-            if ' Ward ' in muni:
-                muni = muni[:muni.index(' Ward ')]
-            sen_district_towns[district].add(muni)
+    data = {}
 
-        # Get all historical Senate votes by town
-        cursor.execute("""
-            SELECT
-                res.municipality,
-                SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-                SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Senator'
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            AND res.municipality IS NOT NULL
-            GROUP BY res.municipality
-        """)
-        sen_town_votes = {}
-        for muni, r_votes, d_votes in cursor.fetchall():
-            if ' Ward ' in muni:
-                base = muni[:muni.index(' Ward ')]
-                if base not in sen_town_votes:
-                    sen_town_votes[base] = {'r': 0, 'd': 0}
-                sen_town_votes[base]['r'] += r_votes
-                sen_town_votes[base]['d'] += d_votes
-            else:
-                if muni not in sen_town_votes:
-                    sen_town_votes[muni] = {'r': 0, 'd': 0}
-                sen_town_votes[muni]['r'] += r_votes
-                sen_town_votes[muni]['d'] += d_votes
+    # County code mapping for House districts
+    county_codes = {
+        'Belknap': 'BE', 'Carroll': 'CA', 'Cheshire': 'CH',
+        'Coos': 'CO', 'Grafton': 'GR', 'Hillsborough': 'HI',
+        'Merrimack': 'ME', 'Rockingham': 'RO', 'Strafford': 'ST', 'Sullivan': 'SU'
+    }
 
-        # Calculate margin for each current district using historical town data
-        for district, towns in sen_district_towns.items():
-            r_votes = sum(sen_town_votes.get(t, {}).get('r', 0) for t in towns)
-            d_votes = sum(sen_town_votes.get(t, {}).get('d', 0) for t in towns)
-            total = r_votes + d_votes
-            margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            data[f'sen_{district}'] = {
-                'margin': round(margin, 1),
-                'r_votes': r_votes,
-                'd_votes': d_votes,
-                'total_votes': total
-            }
+    # Determine years to query
+    if year:
+        years = [int(year)]
     else:
-        # Specific year - get candidate-level data for display
-        cursor.execute(f"""
-            SELECT
-                r.district,
-                c.name as candidate_name,
-                c.party,
-                SUM(res.votes) as votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Senator'
-            AND {year_clause}
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY r.district, c.name, c.party
-            ORDER BY r.district, votes DESC
-        """)
-
-        sen_candidates = defaultdict(list)
-        for row in cursor.fetchall():
-            district, candidate_name, party, votes = row
-            sen_candidates[district].append({
-                'name': candidate_name,
-                'party': party[0] if party else '?',  # R or D
-                'votes': votes
-            })
-
-        for district, candidates in sen_candidates.items():
-            r_votes = sum(c['votes'] for c in candidates if c['party'] == 'R')
-            d_votes = sum(c['votes'] for c in candidates if c['party'] == 'D')
-            total = sum(c['votes'] for c in candidates)
-            margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            # Get top 2 candidates for display
-            top_candidates = candidates[:2]
-            data[f'sen_{district}'] = {
-                'margin': round(margin, 1),
-                'r_votes': r_votes,
-                'd_votes': d_votes,
-                'total_votes': total,
-                'candidates': top_candidates
-            }
+        years = [2016, 2018, 2020, 2022, 2024]
+    year_clause = f"e.year IN ({','.join('?' * len(years))})"
 
-    # Executive Council (keyed with ec_ prefix)
+    # House districts - need special handling for multi-seat
     # For average (year=None), use current district boundaries with historical town data
     if not year:
-        # Get current (2024) district-to-town mapping
+        # Get current (2024) district-to-town mapping for base and
+        # floterial districts
+        house_district_towns = defaultdict(set)
+        floterial_district_towns = defaultdict(set)
+        for county, district, town in _current_district_towns(cursor, 'State Representative'):
+            if county in county_codes and district:
+                code = county_codes[county] + str(district)
+                if 'F' in district:
+                    floterial_district_towns[code].add(town)
+                else:
+                    house_district_towns[code].add(town)
+
+        # Get seat counts from 2024
         cursor.execute("""
-            SELECT DISTINCT r.district, res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
+            SELECT r.county, r.district, r.seats
+            FROM races r
             JOIN offices o ON r.office_id = o.id
             JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'Executive Councilor'
+            WHERE o.name = 'State Representative'
             AND e.year = 2024
-            AND res.municipality IS NOT NULL
-            AND res.municipality != ''
         """)
-        ec_district_towns = defaultdict(set)
-        for district, muni in cursor.fetchall():
-            # Normalize ward names
-            if ' Ward ' in muni:
-                muni = muni[:muni.index(' Ward ')]
-            ec_district_towns[district].add(muni)
-
-        # Get all historical EC votes by town
-        cursor.execute("""
-            SELECT
-                res.municipality,
-                SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-                SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Executive Councilor'
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            AND res.municipality IS NOT NULL
-            GROUP BY res.municipality
+        house_district_seats = {}
+        for county, district, seats in cursor:
+            if county in county_codes:
+                code = county_codes[county] + str(district)
+                house_district_seats[code] = seats or 1
+
+        # Get all historical House votes by town using TOP vote-getter per party per race
+        # This is fair for multi-member races where one party may run more candidates.
+        # Wards fold into their town; each (town, race) contributes its top R
+        # and top D, summed per town.
+        cursor.execute(f"""
+            SELECT town, SUM(top_r), SUM(top_d)
+            FROM (
+                SELECT
+                    town,
+                    MAX(CASE WHEN party = 'Republican' THEN votes ELSE 0 END) as top_r,
+                    MAX(CASE WHEN party = 'Democratic' THEN votes ELSE 0 END) as top_d
+                FROM (
+                    SELECT
+                        {BASE_TOWN_SQL} as town,
+                        r.id as race_id,
+                        c.party,
+                        SUM(res.votes) as votes
+                    FROM results res
+                    JOIN candidates c ON res.candidate_id = c.id
+                    JOIN races r ON res.race_id = r.id
+                    JOIN elections e ON r.election_id = e.id
+                    JOIN offices o ON r.office_id = o.id
+                    WHERE o.name = 'State Representative'
+                    AND e.election_type = 'general'
+                    AND c.is_real = 1
+                    AND res.municipality IS NOT NULL
+                    AND c.party IN ('Republican', 'Democratic')
+                    GROUP BY res.municipality, r.id, c.name, c.party
+                )
+                GROUP BY town, race_id
+            )
+            GROUP BY town
         """)
-        ec_town_votes = {}
-        for muni, r_votes, d_votes in cursor.fetchall():
-            if ' Ward ' in muni:
-                base = muni[:muni.index(' Ward ')]
-                if base not in ec_town_votes:
-                    ec_town_votes[base] = {'r': 0, 'd': 0}
-                ec_town_votes[base]['r'] += r_votes
-                ec_town_votes[base]['d'] += d_votes
-            else:
-                if muni not in ec_town_votes:
-                    ec_town_votes[muni] = {'r': 0, 'd': 0}
-                ec_town_votes[muni]['r'] += r_votes
-                ec_town_votes[muni]['d'] += d_votes
+        house_town_votes = {town: (top_r, top_d) for town, top_r, top_d in cursor}
 
         # Calculate margin for each current district using historical town data
-        for district, towns in ec_district_towns.items():
-            r_votes = sum(ec_town_votes.get(t, {}).get('r', 0) for t in towns)
-            d_votes = sum(ec_town_votes.get(t, {}).get('d', 0) for t in towns)
+        for code, towns in house_district_towns.items():
+            r_votes, d_votes = _sum_town_votes(house_town_votes, towns)
             total = r_votes + d_votes
             margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            data[f'ec_{district}'] = {
+            seats = house_district_seats.get(code, 1)
+            data[code] = {
                 'margin': round(margin, 1),
                 'r_votes': r_votes,
                 'd_votes': d_votes,
-                'total_votes': total
+                'total_votes': total,
+                'seats': seats,
+                'r_seats': seats if margin > 0 else 0,  # Approximate for average
+                'd_seats': seats if margin < 0 else 0
             }
-    else:
-        # Specific year - get candidate-level data for display
-        cursor.execute(f"""
-            SELECT
-                r.district,
-                c.name as candidate_name,
-                c.party,
-                SUM(res.votes) as votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Executive Councilor'
-            AND {year_clause}
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY r.district, c.name, c.party
-            ORDER BY r.district, votes DESC
-        """)
-
-        ec_candidates = defaultdict(list)
-        for row in cursor.fetchall():
-            district, candidate_name, party, votes = row
-            ec_candidates[district].append({
-                'name': candidate_name,
-                'party': party[0] if party else '?',
-                'votes': votes
-            })
 
-        for district, candidates in ec_candidates.items():
-            r_votes = sum(c['votes'] for c in candidates if c['party'] == 'R')
-            d_votes = sum(c['votes'] for c in candidates if c['party'] == 'D')
-            total = sum(c['votes'] for c in candidates)
+        # Floterial districts - same approach
+        for code, towns in floterial_district_towns.items():
+            r_votes, d_votes = _sum_town_votes(house_town_votes, towns)
+            total = r_votes + d_votes
             margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            top_candidates = candidates[:2]
-            data[f'ec_{district}'] = {
+            seats = house_district_seats.get(code, 1)
+            data[code] = {
                 'margin': round(margin, 1),
                 'r_votes': r_votes,
                 'd_votes': d_votes,
                 'total_votes': total,
-                'candidates': top_candidates
+                'seats': seats,
+                'r_seats': seats if margin > 0 else 0,
+                'd_seats': seats if margin < 0 else 0
             }
-
-    # Congress (keyed with cong_ prefix)
-    # For average, use current district boundaries with historical town data
-    if not year:
-        # Get current (2024) district-to-town mapping
-        cursor.execute("""
-            SELECT DISTINCT r.district, res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE o.name = 'Representative in Congress'
-            AND e.year = 2024
-            AND res.municipality IS NOT NULL
-            AND res.municipality != ''
-        """)
-        cong_district_towns = defaultdict(set)
-        for district, muni in cursor.fetchall():
-            if ' Ward ' in muni:
-                muni = muni[:muni.index(' Ward ')]
-            cong_district_towns[district].add(muni)
-
-        # Get all historical Congress votes by town
-        cursor.execute("""
-            SELECT
-                res.municipality,
-                SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
-                SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
+    else:
+        # Specific year - use that year's data directly
+        # First get seat counts
+        cursor.execute(f"""
+            SELECT r.county, r.district, r.seats
+            FROM races r
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Representative in Congress'
+            WHERE o.name = 'State Representative'
+            AND {year_clause}
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            AND res.municipality IS NOT NULL
-            GROUP BY res.municipality
-        """)
-        cong_town_votes = {}
-        for muni, r_votes, d_votes in cursor.fetchall():
-            if ' Ward ' in muni:
-                base = muni[:muni.index(' Ward ')]
-                if base not in cong_town_votes:
-                    cong_town_votes[base] = {'r': 0, 'd': 0}
-                cong_town_votes[base]['r'] += r_votes
-                cong_town_votes[base]['d'] += d_votes
-            else:
-                if muni not in cong_town_votes:
-                    cong_town_votes[muni] = {'r': 0, 'd': 0}
-                cong_town_votes[muni]['r'] += r_votes
-                cong_town_votes[muni]['d'] += d_votes
-
-        for district, towns in cong_district_towns.items():
-            r_votes = sum(cong_town_votes.get(t, {}).get('r', 0) for t in towns)
-            d_votes = sum(cong_town_votes.get(t, {}).get('d', 0) for t in towns)
-            total = r_votes + d_votes
-            margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            data[f'cong_{district}'] = {
-                'margin': round(margin, 1),
-                'r_votes': r_votes,
-                'd_votes': d_votes,
-                'total_votes': total
-            }
-    else:
-        # Specific year - get candidate-level data for display
+        """, years)
+        district_seats = {}
+        for county, district, seats in cursor:
+            if county in county_codes:
+                code = county_codes[county] + str(district)
+                district_seats[code] = seats or 1
+
         cursor.execute(f"""
             SELECT
+                r.county,
                 r.district,
                 c.name as candidate_name,
                 c.party,
@@ -2512,37 +2215,95 @@ def get_districts_map_data(year=None, metric='margin'):
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Representative in Congress'
+            WHERE o.name = 'State Representative'
             AND {year_clause}
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY r.district, c.name, c.party
-            ORDER BY r.district, votes DESC
-        """)
+            AND c.is_real = 1
+            GROUP BY r.county, r.district, c.name, c.party
+            ORDER BY r.county, r.district, votes DESC
+        """, years)
 
-        cong_candidates = defaultdict(list)
-        for row in cursor.fetchall():
-            district, candidate_name, party, votes = row
-            cong_candidates[district].append({
-                'name': candidate_name,
-                'party': party[0] if party else '?',
-                'votes': votes
-            })
+        # Group candidates by district
+        district_candidates = defaultdict(list)
+        for county, district, candidate_name, party, votes in cursor:
+            if county in county_codes:
+                code = county_codes[county] + str(district)
+                district_candidates[code].append({
+                    'name': candidate_name,
+                    'party': party,
+                    'votes': votes
+                })
 
-        for district, candidates in cong_candidates.items():
-            r_votes = sum(c['votes'] for c in candidates if c['party'] == 'R')
-            d_votes = sum(c['votes'] for c in candidates if c['party'] == 'D')
-            total = sum(c['votes'] for c in candidates)
-            margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
-            top_candidates = candidates[:2]
-            data[f'cong_{district}'] = {
+        # Process each district - use actual seat count from database.
+        # Candidates arrived sorted by votes descending within each district.
+        for code, candidates in district_candidates.items():
+            # Use actual seat count from database
+            num_seats = district_seats.get(code, 1)
+            if len(candidates) == 0:
+                continue
+
+            # Get winners (top N vote-getters)
+            winners = candidates[:num_seats]
+            r_winners = sum(1 for w in winners if w['party'] == 'Republican')
+            d_winners = sum(1 for w in winners if w['party'] == 'Democratic')
+
+            # Calculate votes using TOP vote-getter per party (fair for multi-member)
+            top_r = top_d = total_votes = 0
+            for c in candidates:
+                votes = c['votes']
+                total_votes += votes
+                if c['party'] == 'Republican':
+                    if votes > top_r:
+                        top_r = votes
+                elif c['party'] == 'Democratic' and votes > top_d:
+                    top_d = votes
+
+            if num_seats > 1 and len(candidates) > num_seats:
+                # Multi-seat: use threshold margin (last winner vs first loser)
+                last_winner = candidates[num_seats - 1]
+                first_loser = candidates[num_seats]
+                threshold_total = last_winner['votes'] + first_loser['votes']
+                if threshold_total > 0:
+                    # Positive if R would gain seat, negative if D would gain seat
+                    if last_winner['party'] == 'Republican':
+                        # R holds the last seat - margin is R advantage
+                        margin = (last_winner['votes'] - first_loser['votes']) / threshold_total * 100
+                    elif last_winner['party'] == 'Democratic':
+                        # D holds the last seat - margin is D advantage (negative)
+                        margin = -(last_winner['votes'] - first_loser['votes']) / threshold_total * 100
+                    else:
+                        margin = 0
+                else:
+                    margin = 0
+            else:
+                # Single seat or no losers: use top vote-getter margin
+                rd_total = top_r + top_d
+                margin = ((top_r - top_d) / rd_total * 100) if rd_total > 0 else 0
+
+            # For State House, include top candidates for display
+            top_candidates = []
+            for c in candidates[:min(4, num_seats * 2)]:  # Top candidates up to 2x seats
+                top_candidates.append({
+                    'name': c['name'],
+                    'party': c['party'][0] if c['party'] else '?',
+                    'votes': c['votes']
+                })
+
+            data[code] = {
                 'margin': round(margin, 1),
-                'r_votes': r_votes,
-                'd_votes': d_votes,
-                'total_votes': total,
-                'candidates': top_candidates
+                'r_votes': top_r,
+                'd_votes': top_d,
+                'total_votes': total_votes,
+                'seats': num_seats,
+                'r_seats': r_winners,
+                'd_seats': d_winners,
+                'candidates': top_candidates if year else None  # Only include for specific year
             }
 
+    # Senate, Executive Council and Congress districts
+    for office, prefix in DISTRICT_OFFICES:
+        data.update(_district_office_map_data(cursor, office, prefix, years[0] if year else None))
+
     # Towns (keyed by name) - aggregate wards into cities
     # Calculate margin per race, then average across races (not cumulative totals)
     cursor.execute(f"""
@@ -2562,7 +2323,7 @@ def get_districts_map_data(year=None, metric='margin'):
         JOIN elections e ON r.election_id = e.id
         WHERE {year_clause}
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND res.municipality IS NOT NULL
         AND res.municipality != ''
         AND res.municipality NOT GLOB '[0-9]*'
@@ -2572,12 +2333,11 @@ def get_districts_map_data(year=None, metric='margin'):
             THEN SUBSTR(res.municipality, 1, INSTR(res.municipality, ' Ward ') - 1)
             ELSE res.municipality
         END, r.id
-    """)
+    """, years)
 
     # Collect margins by town, then average them
     town_race_data = defaultdict(list)
-    for row in cursor.fetchall():
-        town, race_id, r_votes, d_votes, total = row
+    for town, race_id, r_votes, d_votes, total in cursor:
         if town and total > 0 and r_votes > 0 and d_votes > 0:  # Only count competitive races
             margin = ((r_votes - d_votes) / total * 100)
             town_race_data[town].append({
@@ -2616,7 +2376,7 @@ def get_districts_map_data(year=None, metric='margin'):
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id
             HAVING r_votes > 0 AND d_votes > 0
         """)
@@ -2624,8 +2384,7 @@ def get_districts_map_data(year=None, metric='margin'):
         competitive_races = set()
         statewide_r = 0
         statewide_total = 0
-        for row in cursor.fetchall():
-            race_id, r_votes, d_votes = row
+        for race_id, r_votes, d_votes in cursor:
             competitive_races.add(race_id)
             statewide_r += r_votes
             statewide_total += r_votes + d_votes
@@ -2645,7 +2404,7 @@ def get_districts_map_data(year=None, metric='margin'):
             JOIN races r ON res.race_id = r.id
             JOIN elections e ON r.election_id = e.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND res.municipality IS NOT NULL
             AND res.municipality != ''
             AND res.municipality NOT GLOB '[0-9]*'
@@ -2656,8 +2415,7 @@ def get_districts_map_data(year=None, metric='margin'):
         # IMPORTANT: Keep ward-level granularity (Manchester Ward 8, etc.)
         # This ensures PVI is calculated only for the specific wards in a district
         muni_votes = defaultdict(lambda: {'r': 0, 'total': 0})
-        for row in cursor.fetchall():
-            muni, race_id, r_votes, d_votes = row
+        for muni, race_id, r_votes, d_votes in cursor:
             if race_id in competitive_races:
                 muni_votes[muni]['r'] += r_votes
                 muni_votes[muni]['total'] += r_votes + d_votes
@@ -2677,8 +2435,7 @@ def get_districts_map_data(year=None, metric='margin'):
         """)
 
         district_munis = defaultdict(set)
-        for row in cursor.fetchall():
-            county, district, muni = row
+        for county, district, muni in cursor:
             if county in county_codes:
                 code = county_codes[county] + str(district)
                 # Keep full municipality name (including ward info) for accurate PVI
@@ -2694,89 +2451,11 @@ def get_districts_map_data(year=None, metric='margin'):
                 if code in data:
                     data[code]['pvi'] = round(pvi, 1)
 
-        # Step 4: For Senate districts, find municipalities and calculate PVI
-        cursor.execute("""
-            SELECT DISTINCT
-                r.district,
-                res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'State Senator'
-            AND res.municipality IS NOT NULL
-            AND res.municipality NOT GLOB '[0-9]*'
-        """)
-
-        senate_munis = defaultdict(set)
-        for row in cursor.fetchall():
-            district, muni = row
-            # Keep full municipality name (including ward info) for accurate PVI
-            senate_munis[f'sen_{district}'].add(muni)
-
-        for code, munis in senate_munis.items():
-            district_r = sum(muni_votes[m]['r'] for m in munis)
-            district_total = sum(muni_votes[m]['total'] for m in munis)
-            if district_total > 0:
-                district_r_pct = district_r / district_total * 100
-                pvi = district_r_pct - statewide_r_pct
-                if code in data:
-                    data[code]['pvi'] = round(pvi, 1)
-
-        # Step 5: For Exec Council districts
-        cursor.execute("""
-            SELECT DISTINCT
-                r.district,
-                res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Executive Councilor'
-            AND res.municipality IS NOT NULL
-            AND res.municipality NOT GLOB '[0-9]*'
-        """)
-
-        ec_munis = defaultdict(set)
-        for row in cursor.fetchall():
-            district, muni = row
-            # Keep full municipality name (including ward info) for accurate PVI
-            ec_munis[f'ec_{district}'].add(muni)
-
-        for code, munis in ec_munis.items():
-            district_r = sum(muni_votes[m]['r'] for m in munis)
-            district_total = sum(muni_votes[m]['total'] for m in munis)
-            if district_total > 0:
-                district_r_pct = district_r / district_total * 100
-                pvi = district_r_pct - statewide_r_pct
-                if code in data:
-                    data[code]['pvi'] = round(pvi, 1)
-
-        # Step 6: For Congressional districts
-        cursor.execute("""
-            SELECT DISTINCT
-                r.district,
-                res.municipality
-            FROM results res
-            JOIN races r ON res.race_id = r.id
-            JOIN offices o ON r.office_id = o.id
-            WHERE o.name = 'Representative in Congress'
-            AND res.municipality IS NOT NULL
-            AND res.municipality NOT GLOB '[0-9]*'
-        """)
-
-        cong_munis = defaultdict(set)
-        for row in cursor.fetchall():
-            district, muni = row
-            # Keep full municipality name (including ward info) for accurate PVI
-            cong_munis[f'cong_{district}'].add(muni)
-
-        for code, munis in cong_munis.items():
-            district_r = sum(muni_votes[m]['r'] for m in munis)
-            district_total = sum(muni_votes[m]['total'] for m in munis)
-            if district_total > 0:
-                district_r_pct = district_r / district_total * 100
-                pvi = district_r_pct - statewide_r_pct
+        # Steps 4-6: Senate, Executive Council and Congressional districts
+        for office, prefix in DISTRICT_OFFICES:
+            for code, pvi in _district_office_pvi(cursor, office, prefix, muni_votes, statewide_r_pct).items():
                 if code in data:
-                    data[code]['pvi'] = round(pvi, 1)
+                    data[code]['pvi'] = pvi
 
         # Step 7: For towns, aggregate ward data into cities for PVI
         # Since the towns data (in 'data' dict) is already aggregated,
@@ -2798,7 +2477,6 @@ def get_districts_map_data(year=None, metric='margin'):
                 if town in data:
                     data[town]['pvi'] = round(pvi, 1)
 
-    conn.close()
     return data
 
 
@@ -2824,7 +2502,7 @@ def get_map_data(year, metric='pvi'):
             JOIN elections e ON r.election_id = e.id
             WHERE e.year = ?
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND res.municipality NOT GLOB '[0-9]*'
             AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS')
             GROUP BY res.municipality
@@ -2835,8 +2513,7 @@ def get_map_data(year, metric='pvi'):
         state_r_pct = statewide.get(year, {}).get('r_pct', 50)
 
         data = {}
-        for row in cursor.fetchall():
-            town, r_votes, d_votes, total = row
+        for town, r_votes, d_votes, total in cursor:
             if total > 0:
                 town_r_pct = (r_votes / total) * 100
                 pvi = town_r_pct - state_r_pct
@@ -2854,15 +2531,14 @@ def get_map_data(year, metric='pvi'):
             JOIN elections e ON r.election_id = e.id
             WHERE e.year = ?
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND res.municipality NOT GLOB '[0-9]*'
             AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS')
             GROUP BY res.municipality
         """, (year,))
 
         data = {}
-        for row in cursor.fetchall():
-            town, r_votes, d_votes = row
+        for town, r_votes, d_votes in cursor:
             total = r_votes + d_votes
             if total > 0:
                 margin = (r_votes - d_votes) / total * 100
@@ -2886,11 +2562,9 @@ def get_map_data(year, metric='pvi'):
         """, (year,))
 
         data = {}
-        for row in cursor.fetchall():
-            town, votes = row
+        for town, votes in cursor:
             data[town] = votes
 
-    conn.close()
     return data
 
 
@@ -2914,7 +2588,7 @@ def export_town_data(year=None):
         JOIN races r ON res.race_id = r.id
         JOIN elections e ON r.election_id = e.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND res.municipality NOT GLOB '[0-9]*'
         AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS')
         {year_filter}
@@ -2923,8 +2597,7 @@ def export_town_data(year=None):
     """, params)
 
     data = []
-    for row in cursor.fetchall():
-        town, yr, r_votes, d_votes, total = row
+    for town, yr, r_votes, d_votes, total in cursor:
         margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
         data.append({
             'town': town,
@@ -2935,7 +2608,6 @@ def export_town_data(year=None):
             'margin': round(margin, 1)
         })
 
-    conn.close()
     return data
 
 
@@ -2963,15 +2635,14 @@ def export_district_data(year=None):
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         {year_filter}
         GROUP BY o.name, r.county, r.district, e.year
         ORDER BY o.name, r.county, r.district, e.year
     """, params)
 
     data = []
-    for row in cursor.fetchall():
-        office, county, district, yr, seats, r_votes, d_votes, total = row
+    for office, county, district, yr, seats, r_votes, d_votes, total in cursor:
         margin = ((r_votes - d_votes) / total * 100) if total > 0 else 0
         data.append({
             'office': office,
@@ -2985,7 +2656,6 @@ def export_district_data(year=None):
             'margin': round(margin, 1)
         })
 
-    conn.close()
     return data
 
 
@@ -2993,6 +2663,7 @@ def export_race_data(year=None):
     """Export race-level data."""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
 
     year_filter = "AND e.year = ?" if year else ""
     params = (year,) if year else ()
@@ -3012,14 +2683,13 @@ def export_race_data(year=None):
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         {year_filter}
         GROUP BY e.year, r.id, c.id
         ORDER BY e.year, o.name, r.county, r.district, total_votes DESC
     """, params)
 
-    data = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    data = [dict(row) for row in cursor]
     return data
 
 
@@ -3027,6 +2697,7 @@ def export_candidate_data(year=None):
     """Export candidate performance data."""
     conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
 
     year_filter = "AND e.year = ?" if year else ""
     params = (year,) if year else ()
@@ -3046,14 +2717,13 @@ def export_candidate_data(year=None):
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         {year_filter}
         GROUP BY c.name, e.year, r.id
         ORDER BY c.name, e.year
     """, params)
 
-    data = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    data = [dict(row) for row in cursor]
     return data
 
 
@@ -3063,35 +2733,14 @@ def get_all_districts_with_pvi(office):
     PVI = district R% (all contested races) - statewide R% (all contested races).
     Returns list sorted by current PVI (most R to most D).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Get statewide baseline: R% across all contested races
-    cursor.execute("""
-        WITH race_totals AS (
-            SELECT e.year, r.id as race_id,
-                   SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r,
-                   SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d
-            FROM results res
-            JOIN candidates c ON res.candidate_id = c.id
-            JOIN races r ON res.race_id = r.id
-            JOIN elections e ON r.election_id = e.id
-            WHERE e.year IN (2022, 2024)
-            AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-            GROUP BY e.year, r.id
-            HAVING r > 0 AND d > 0  -- contested only
-        )
-        SELECT year, SUM(r) as total_r, SUM(d) as total_d
-        FROM race_totals
-        GROUP BY year
-    """)
-    state_baseline = {}
-    for year, total_r, total_d in cursor.fetchall():
-        state_baseline[year] = total_r / (total_r + total_d) * 100 if (total_r + total_d) > 0 else 50
+    # Statewide baseline: R% across all contested races
+    state_baseline = _statewide_contested_by_year()
     state_r_pct_2024 = state_baseline.get(2024, 50)
     state_r_pct_2022 = state_baseline.get(2022, 50)
 
+    conn = get_connection()
+    cursor = conn.cursor()
+
     # Check if this is a county-based office
     is_county_based = office == 'State Representative'
 
@@ -3108,41 +2757,22 @@ def get_all_districts_with_pvi(office):
             AND e.election_type = 'general'
         """, (office,))
 
-        district_towns = defaultdict(set)
         district_seats = {}
-        for county, district, seats, municipality in cursor.fetchall():
-            key = (county, district)
-            district_towns[key].add(municipality)
-            district_seats[key] = seats
-
-        # Get all votes by municipality for contested races (for PVI calculation)
-        cursor.execute("""
-            WITH race_totals AS (
-                SELECT e.year, r.id as race_id, res.municipality,
-                       SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r,
-                       SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d
-                FROM results res
-                JOIN candidates c ON res.candidate_id = c.id
-                JOIN races r ON res.race_id = r.id
-                JOIN elections e ON r.election_id = e.id
-                WHERE e.year IN (2022, 2024)
-                AND e.election_type = 'general'
-                AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-                GROUP BY e.year, r.id, res.municipality
-            ),
-            contested AS (
-                SELECT year, municipality, r, d
-                FROM race_totals
-                WHERE r > 0 AND d > 0
-            )
-            SELECT year, municipality, SUM(r) as r, SUM(d) as d
-            FROM contested
-            GROUP BY year, municipality
-        """)
-
-        town_votes = defaultdict(lambda: defaultdict(lambda: {'r': 0, 'd': 0}))
-        for year, municipality, r, d in cursor.fetchall():
-            town_votes[year][municipality] = {'r': r, 'd': d}
+        district_towns = set()
+        for county, district, seats, municipality in cursor:
+            district_seats[(county, district)] = seats
+            district_towns.add((county, district, municipality))
+
+        # Contested-race votes (for PVI calculation) summed over each
+        # district's current towns, from the shared per-town totals
+        town_votes = _town_contested_by_year()
+        district_votes = defaultdict(lambda: {2022: (0, 0), 2024: (0, 0)})
+        for county, district, municipality in district_towns:
+            votes = district_votes[(county, district)]
+            for year, (r, d) in town_votes.get(municipality, {}).items():
+                if year in votes:
+                    r_sum, d_sum = votes[year]
+                    votes[year] = (r_sum + r, d_sum + d)
 
         # Get State Rep race results for each district (for showing winners/margin)
         cursor.execute("""
@@ -3156,14 +2786,14 @@ def get_all_districts_with_pvi(office):
             WHERE o.name = ?
             AND e.year IN (2022, 2024)
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             AND c.party IN ('Republican', 'Democratic')
             GROUP BY e.year, r.county, r.district, c.id
         """, (office,))
 
         # Get top vote-getter per party per district for margin calc
         district_results = defaultdict(lambda: defaultdict(lambda: {'top_r': 0, 'top_d': 0}))
-        for year, county, district, party, votes in cursor.fetchall():
+        for year, county, district, party, votes in cursor:
             key = (county, district)
             if party == 'Republican':
                 district_results[key][year]['top_r'] = max(district_results[key][year]['top_r'], votes)
@@ -3171,12 +2801,11 @@ def get_all_districts_with_pvi(office):
                 district_results[key][year]['top_d'] = max(district_results[key][year]['top_d'], votes)
 
         districts = []
-        for (county, district), towns in district_towns.items():
-            # Calculate PVI from all contested races in district towns
-            r_2024 = sum(town_votes[2024].get(t, {}).get('r', 0) for t in towns)
-            d_2024 = sum(town_votes[2024].get(t, {}).get('d', 0) for t in towns)
-            r_2022 = sum(town_votes[2022].get(t, {}).get('r', 0) for t in towns)
-            d_2022 = sum(town_votes[2022].get(t, {}).get('d', 0) for t in towns)
+        for (county, district), seats in district_seats.items():
+            # PVI from all contested races in district towns
+            votes = district_votes.get((county, district), {})
+            r_2024, d_2024 = votes.get(2024, (0, 0))
+            r_2022, d_2022 = votes.get(2022, (0, 0))
 
             if (r_2024 + d_2024) > 0:
                 dist_r_pct_2024 = r_2024 / (r_2024 + d_2024) * 100
@@ -3201,7 +2830,7 @@ def get_all_districts_with_pvi(office):
             districts.append({
                 'district': district,
                 'county': county,
-                'seats': district_seats.get((county, district), 1),
+                'seats': seats,
                 'pvi': round(pvi_2024, 1),
                 'trend': round(trend, 1),
                 'r_votes': top_r,
@@ -3209,7 +2838,6 @@ def get_all_districts_with_pvi(office):
                 'contested': contested
             })
 
-        conn.close()
         return sorted(districts, key=lambda x: -x['pvi'])
 
     else:
@@ -3229,15 +2857,14 @@ def get_all_districts_with_pvi(office):
             WHERE o.name = ?
             AND e.year IN (2022, 2024)
             AND e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY e.year, r.district
             ORDER BY r.district, e.year
         """, (office,))
 
         district_data = defaultdict(dict)
         district_seats = {}
-        for row in cursor.fetchall():
-            year, district, seats, r_votes, d_votes = row
+        for year, district, seats, r_votes, d_votes in cursor:
             district_data[district][year] = {'r': r_votes, 'd': d_votes}
             district_seats[district] = seats
 
@@ -3283,8 +2910,6 @@ def get_all_districts_with_pvi(office):
                 'contested': r > 0 and d > 0
             })
 
-    conn.close()
-
     # Sort by PVI (most R first)
     districts.sort(key=lambda x: -x['pvi'])
 
@@ -3314,7 +2939,7 @@ def get_undervote_analysis():
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND res.municipality IS NOT NULL
         AND res.municipality != ''
         AND res.municipality NOT GLOB '[0-9]*'
@@ -3323,7 +2948,7 @@ def get_undervote_analysis():
 
     # Organize data by year and municipality
     data = defaultdict(lambda: defaultdict(dict))
-    for year, office, muni, votes in cursor.fetchall():
+    for year, office, muni, votes in cursor:
         # Normalize ward names
         if ' Ward ' in muni:
             muni = muni[:muni.index(' Ward ')]
@@ -3381,7 +3006,6 @@ def get_undervote_analysis():
     results['worst_undervote'].sort(key=lambda x: -x['undervote_pct'])
     results['worst_undervote'] = results['worst_undervote'][:50]
 
-    conn.close()
     return results
 
 
@@ -3406,7 +3030,7 @@ def get_turnout_patterns():
 
     # Organize by town (aggregating wards into cities)
     town_data = defaultdict(lambda: defaultdict(int))
-    for year, muni, ballots in cursor.fetchall():
+    for year, muni, ballots in cursor:
         if ' Ward ' in muni:
             muni = muni[:muni.index(' Ward ')]
         town_data[muni][year] += ballots
@@ -3482,7 +3106,6 @@ def get_turnout_patterns():
             'is_presidential': year % 4 == 0
         }
 
-    conn.close()
     return results
 
 
@@ -3517,7 +3140,7 @@ def get_ticket_splitting_analysis():
 
     # Organize data
     data = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: {'R': 0, 'D': 0})))
-    for year, muni, office, party, votes in cursor.fetchall():
+    for year, muni, office, party, votes in cursor:
         if ' Ward ' in muni:
             muni = muni[:muni.index(' Ward ')]
         p = 'R' if party == 'Republican' else 'D'
@@ -3602,7 +3225,6 @@ def get_ticket_splitting_analysis():
     results['split_towns'].sort(key=lambda x: -abs(x['split']))
     results['split_towns'] = results['split_towns'][:100]
 
-    conn.close()
     return results
 
 
@@ -3634,7 +3256,7 @@ def get_bellwether_analysis():
             WHERE e.election_type = 'general'
             AND o.name = 'State Representative'
             AND c.party IN ('Republican', 'Democratic')
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id, c.id
         )
         SELECT year, party, COUNT(*) as seats_won
@@ -3645,7 +3267,7 @@ def get_bellwether_analysis():
 
     house_control = {}
     seats_by_year = defaultdict(lambda: {'R': 0, 'D': 0})
-    for year, party, seats in cursor.fetchall():
+    for year, party, seats in cursor:
         p = 'R' if party == 'Republican' else 'D'
         seats_by_year[year][p] = seats
 
@@ -3670,7 +3292,7 @@ def get_bellwether_analysis():
     """)
 
     statewide_rep_votes = defaultdict(lambda: {'R': 0, 'D': 0})
-    for year, party, votes in cursor.fetchall():
+    for year, party, votes in cursor:
         p = 'R' if party == 'Republican' else 'D'
         statewide_rep_votes[year][p] = votes
 
@@ -3721,7 +3343,7 @@ def get_bellwether_analysis():
     """)
 
     town_data = defaultdict(lambda: defaultdict(lambda: {'R': 0, 'D': 0}))
-    for year, muni, party, votes in cursor.fetchall():
+    for year, muni, party, votes in cursor:
         if ' Ward ' in muni:
             muni = muni[:muni.index(' Ward ')]
         p = 'R' if party == 'Republican' else 'D'
@@ -3770,8 +3392,6 @@ def get_bellwether_analysis():
     # Sort by accuracy first, then lowest deviation
     bellwethers.sort(key=lambda x: (-x['accuracy'], x['avg_deviation']))
 
-    conn.close()
-
     return {
         'statewide_margins': statewide_margins,
         'house_control': house_control,
@@ -3810,15 +3430,14 @@ def get_swing_analysis():
         WHERE o.name = 'State Representative'
         AND e.year IN (2020, 2022, 2024)
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND c.party IN ('Republican', 'Democratic')
         GROUP BY e.year, r.county, r.district, c.name, c.party
     """)
 
     # Aggregate by district and year using top vote-getter
     district_data = defaultdict(lambda: defaultdict(lambda: {'top_r': 0, 'top_d': 0, 'seats': 1}))
-    for row in cursor.fetchall():
-        year, county, district, seats, party, votes = row
+    for year, county, district, seats, party, votes in cursor:
         key = (county, district)
         if party == 'Republican':
             district_data[key][year]['top_r'] = max(district_data[key][year]['top_r'], votes)
@@ -3904,8 +3523,6 @@ def get_swing_analysis():
     # Sort by closest margin
     swing_districts.sort(key=lambda x: abs(x['margin']))
 
-    conn.close()
-
     # Get trending districts (sorted by trend magnitude, limited for display)
     trending_r = sorted([d for d in swing_districts if d['trend_valid'] and d['trend'] > 3],
                        key=lambda x: -x['trend'])[:15]
@@ -3950,7 +3567,7 @@ def get_multi_seat_analysis():
     """)
 
     districts = []
-    for county, district, seats in cursor.fetchall():
+    for county, district, seats in cursor:
         # Get candidate data for multiple years
         years_data = {}
         for year in [2016, 2018, 2020, 2022, 2024]:
@@ -4030,8 +3647,6 @@ def get_multi_seat_analysis():
             'towns': towns
         })
 
-    conn.close()
-
     # Sort by smallest gap (most vulnerable)
     districts.sort(key=lambda x: x['gap'])
 
@@ -4073,14 +3688,13 @@ def get_correlation_analysis():
         JOIN offices o ON r.office_id = o.id
         WHERE e.year = 2024
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND c.party IN ('Republican', 'Democratic')
         GROUP BY res.municipality, o.name, c.party
     """)
 
     town_data = defaultdict(lambda: {'total_votes': 0, 'r_votes': 0, 'd_votes': 0})
-    for row in cursor.fetchall():
-        muni, office, party, votes = row
+    for muni, office, party, votes in cursor:
         town_data[muni]['total_votes'] += votes
         if party == 'Republican':
             town_data[muni]['r_votes'] += votes
@@ -4109,8 +3723,6 @@ def get_correlation_analysis():
     large_avg_margin = sum(t['margin'] for t in large_towns) / len(large_towns) if large_towns else 0
     small_avg_margin = sum(t['margin'] for t in small_towns) / len(small_towns) if small_towns else 0
 
-    conn.close()
-
     return {
         'size_correlation': {
             'large_towns_avg_margin': round(large_avg_margin, 1),
@@ -4144,15 +3756,14 @@ def get_long_term_trends():
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND c.party IN ('Republican', 'Democratic')
         AND r.county IS NOT NULL
         GROUP BY e.year, r.county, c.party
     """)
 
     county_data = defaultdict(lambda: defaultdict(lambda: {'r': 0, 'd': 0}))
-    for row in cursor.fetchall():
-        year, county, party, votes = row
+    for year, county, party, votes in cursor:
         if party == 'Republican':
             county_data[county][year]['r'] += votes
         else:
@@ -4191,8 +3802,6 @@ def get_long_term_trends():
     # Sort by shift
     county_trends.sort(key=lambda x: -x['total_shift'])
 
-    conn.close()
-
     return {
         'county_trends': county_trends,
         'shifting_r': [c for c in county_trends if c['total_shift'] > 0],
@@ -4240,8 +3849,7 @@ def get_trump_comparison():
     """)
 
     trump_by_town = {}
-    for row in cursor.fetchall():
-        town, r, d = row
+    for town, r, d in cursor:
         if r + d > 0:
             trump_by_town[town] = {'r': r, 'd': d}
 
@@ -4277,8 +3885,7 @@ def get_trump_comparison():
         'd_candidates': set()
     })
 
-    for row in cursor.fetchall():
-        county, district, seats, town, candidate, party, votes = row
+    for county, district, seats, town, candidate, party, votes in cursor:
         key = (county, district)
         district_data[key]['towns'].add(town)
         district_data[key]['seats'] = seats or 1
@@ -4289,8 +3896,6 @@ def get_trump_comparison():
             district_data[key]['d_votes'] += votes
             district_data[key]['d_candidates'].add(candidate)
 
-    conn.close()
-
     # Calculate comparisons
     results = []
     for (county, district), data in district_data.items():
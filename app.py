@@ -98,7 +98,7 @@ def town(name):
     comparison = None
     if len(summary['years']) >= 2:
         prev_year = summary['years'][-2]
-        comparison = analysis.compare_years(name, prev_year, latest_year)
+        comparison = analysis.compare_years(name, prev_year, latest_year, summary=summary)
 
     # Get PVI data
     pvi = analysis.get_town_pvi(name)
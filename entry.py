@@ -5,6 +5,7 @@ import json
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
 from auth import get_db
+from schema import refresh_derived
 from datetime import datetime
 
 entry_bp = Blueprint('entry', __name__, url_prefix='/entry')
@@ -200,6 +201,8 @@ def save_results(race_id):
             updated += 1
 
     conn.commit()
+    if updated:
+        refresh_derived(conn, race_id)
     conn.close()
 
     return jsonify({'success': True, 'updated': updated})
@@ -6,6 +6,7 @@ Import ballots cast data from XLS files into the database.
 import sqlite3
 import pandas as pd
 from pathlib import Path
+from schema import refresh_derived
 
 DB_PATH = Path(__file__).parent / "nh_elections.db"
 
@@ -144,6 +145,8 @@ def import_ballots_cast():
         print(f"  Imported {len(records)} records for {year}")
         total_imported += len(records)
 
+    # Bring derived columns and tables up to date with the new rows
+    refresh_derived(conn)
     conn.close()
     print(f"\nTotal imported: {total_imported} records")
 
@@ -8,6 +8,7 @@ import sqlite3
 import pandas as pd
 import re
 from pathlib import Path
+from schema import refresh_derived
 
 DB_PATH = Path(__file__).parent / "nh_elections.db"
 ELECTION_FILES = Path("/Users/chrismaidment/Desktop/Data-Elections/election_files")
@@ -588,6 +589,8 @@ def import_missing_towns():
                 print(f"    Inserted {inserted} result rows")
             total_imported += inserted
 
+    # Bring derived columns and tables up to date with the new rows
+    refresh_derived(conn)
     conn.close()
     print(f"\n=== Total imported: {total_imported} result rows ===")
 
@@ -5,12 +5,14 @@ Database queries for NH Election Results Explorer
 
 import sqlite3
 from pathlib import Path
+import schema
 
 DB_PATH = Path(__file__).parent / "nh_elections.db"
 
 
 def get_connection():
     conn = sqlite3.connect(DB_PATH)
+    schema.ensure_derived_current(conn, DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -22,8 +24,7 @@ def get_all_towns():
     cursor.execute("""
         SELECT DISTINCT municipality
         FROM results
-        WHERE municipality NOT GLOB '[0-9]*'
-        AND municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        WHERE is_town = 1
         ORDER BY municipality
     """)
     towns = [row[0] for row in cursor.fetchall()]
@@ -111,7 +112,7 @@ def get_statewide_district_results(office, district):
         AND r.district = ?
         AND e.election_type = 'general'
         AND e.year >= 2016
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY e.year, c.id
         ORDER BY e.year DESC, votes DESC
     """, (office, district))
@@ -148,8 +149,7 @@ def get_towns_in_statewide_district(office, district):
         AND r.district = ?
         AND e.year = (SELECT MAX(year) FROM elections WHERE election_type = 'general')
         AND e.election_type = 'general'
-        AND res.municipality NOT GLOB '[0-9]*'
-        AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        AND res.is_town = 1
         ORDER BY res.municipality
     """, (office, district))
 
@@ -183,7 +183,7 @@ def get_statewide_party_control():
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id, c.id
         )
         SELECT
@@ -238,7 +238,7 @@ def get_town_results(town, year=None):
         JOIN offices o ON r.office_id = o.id
         WHERE res.municipality = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
     """
     params = [town]
 
@@ -269,7 +269,7 @@ def get_town_results(town, year=None):
         JOIN candidates c ON res.candidate_id = c.id
         JOIN races r ON res.race_id = r.id
         WHERE r.id IN ({placeholders})
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY r.id, c.id
         ORDER BY r.id, total_votes DESC
     """, list(race_ids))
@@ -325,7 +325,7 @@ def get_town_trends(town):
         JOIN offices o ON r.office_id = o.id
         WHERE res.municipality = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY e.year, o.name
         ORDER BY e.year, o.name
     """, (town,))
@@ -404,7 +404,7 @@ def get_district_results(county, district, office='State Representative'):
             AND o.name = ?
             AND e.election_type = 'general'
             AND e.year >= 2022
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id, c.id
         )
         SELECT
@@ -447,8 +447,7 @@ def get_district_towns(county, district, office='State Representative'):
         AND o.name = ?
         AND e.year = (SELECT MAX(year) FROM elections WHERE election_type = 'general')
         AND e.election_type = 'general'
-        AND res.municipality NOT GLOB '[0-9]*'
-        AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        AND res.is_town = 1
         ORDER BY res.municipality
     """, (county, str(district), office))
 
@@ -491,7 +490,7 @@ def get_district_candidates(county, district, office='State Representative', yea
         AND o.name = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND c.party IN ('Republican', 'Democratic')
         GROUP BY c.id
         ORDER BY total_votes DESC
@@ -544,7 +543,7 @@ def get_district_winners(county, district, office='State Representative', year=2
         AND o.name = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         GROUP BY c.id
         ORDER BY total_votes DESC
     """, (county, str(district), office, year))
@@ -601,7 +600,7 @@ def search_candidates(query):
         JOIN races r ON res.race_id = r.id
         JOIN elections e ON r.election_id = e.id
         WHERE (c.name LIKE ? OR c.name_normalized LIKE ?)
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND e.election_type = 'general'
     """, (f'%{query}%', f'%{query.upper()}%'))
 
@@ -631,7 +630,7 @@ def search_candidates(query):
         JOIN elections e ON r.election_id = e.id
         JOIN offices o ON r.office_id = o.id
         WHERE r.id IN ({placeholders})
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+        AND c.is_real = 1
         AND e.election_type = 'general'
         GROUP BY r.id, c.id
         ORDER BY e.year DESC, o.name, r.district, total_votes DESC
@@ -699,7 +698,7 @@ def get_candidate_history(candidate_id):
             JOIN elections e ON r.election_id = e.id
             JOIN offices o ON r.office_id = o.id
             WHERE e.election_type = 'general'
-            AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
+            AND c.is_real = 1
             GROUP BY r.id, c.id
         )
         SELECT
@@ -745,9 +744,8 @@ def get_district_town_results(county, district, office='State Representative', y
         AND o.name = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        AND res.municipality NOT GLOB '[0-9]*'
-        AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        AND c.is_real = 1
+        AND res.is_town = 1
         GROUP BY res.municipality
     """, (county, str(district), office, year))
 
@@ -799,9 +797,8 @@ def get_statewide_district_town_results(office, district, year=None):
         AND r.district = ?
         AND e.year = ?
         AND e.election_type = 'general'
-        AND c.name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')
-        AND res.municipality NOT GLOB '[0-9]*'
-        AND res.municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS', 'Court ordered recount', 'court ordered recount')
+        AND c.is_real = 1
+        AND res.is_town = 1
         GROUP BY res.municipality
     """, (office, district, year))
 
@@ -842,7 +839,7 @@ def get_db_stats():
     cursor.execute("SELECT COUNT(DISTINCT municipality) FROM results WHERE municipality NOT GLOB '[0-9]*'")
     stats['municipalities'] = cursor.fetchone()[0]
 
-    cursor.execute("SELECT COUNT(*) FROM candidates WHERE name NOT IN ('Undervotes', 'Overvotes', 'Write-Ins')")
+    cursor.execute("SELECT COUNT(*) FROM candidates WHERE is_real = 1")
     stats['candidates'] = cursor.fetchone()[0]
 
     cursor.execute("SELECT COUNT(*) FROM races")
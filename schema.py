@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Derived schema for NH Election Results Explorer
+Precomputed columns and indexes the analysis queries rely on.
+
+Derived data is rebuilt from results whenever they change: the web app calls
+refresh_derived() after results entry/admin edits, and read connections
+re-check it whenever the database file changes, rebuilding it if the
+database was changed some other way.
+After a manual import, and as a deploy step so no web request has to
+migrate the schema, run:
+    python schema.py
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "nh_elections.db"
+
+# results.is_town: 1 for real municipality rows, 0 for district-number and
+# summary rows (TOTALS, Undervotes, recount notes). Stored and set by
+# refresh_derived(), so filters read an indexed integer instead of
+# re-evaluating the patterns on every row.
+IS_TOWN_SQL = """
+    municipality NOT GLOB '[0-9]*'
+    AND municipality NOT IN ('Undervotes', 'Overvotes', 'Write-Ins', 'TOTALS',
+                             'Court ordered recount', 'court ordered recount')
+"""
+
+# Tally rows stored as candidates; candidates.is_real is 0 for these. A stored
+# integer flag filters noticeably faster than comparing names on every row.
+NON_CANDIDATE_NAMES = "('Undervotes', 'Overvotes', 'Write-Ins')"
+
+# Indexes for the analysis hot paths (town lookups, office/year filters)
+INDEXES = {
+    # Covers town lookups through to the vote counts, so per-town aggregations
+    # never touch the results table itself
+    'idx_results_muni_votes': "CREATE INDEX IF NOT EXISTS idx_results_muni_votes ON results(municipality, race_id, candidate_id, votes)",
+    'idx_races_office_year': "CREATE INDEX IF NOT EXISTS idx_races_office_year ON races(office_id, election_id, district, county)",
+    'idx_elections_year_type': "CREATE INDEX IF NOT EXISTS idx_elections_year_type ON elections(year, election_type)",
+    'idx_races_competitive': "CREATE INDEX IF NOT EXISTS idx_races_competitive ON races(is_competitive, election_id)",
+    'idx_results_town': "CREATE INDEX IF NOT EXISTS idx_results_town ON results(is_town, municipality)",
+    # Covers per-race candidate totals (winner ranking, State Rep canonical
+    # races) and race-driven per-town sums (map data)
+    'idx_results_race_cover': "CREATE INDEX IF NOT EXISTS idx_results_race_cover ON results(race_id, candidate_id, municipality, votes)",
+}
+
+
+def _has_column(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _source_fingerprint(cursor):
+    """Cheap signature of the source tables, used to detect stale derived data."""
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) || ':' || TOTAL(votes) FROM results),
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM races),
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM candidates),
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM elections)
+    """)
+    return '|'.join(cursor.fetchone())
+
+
+def _derived_current(cursor):
+    """True if derived data was last built from the current source tables."""
+    cursor.execute("SELECT value FROM derived_meta WHERE key = 'source_fingerprint'")
+    row = cursor.fetchone()
+    return bool(row) and row[0] == _source_fingerprint(cursor)
+
+
+def db_stamp(path=DB_PATH):
+    """(mtime, size) of the database and its WAL file; changes on every write."""
+    stamp = []
+    for name in (str(path), f"{path}-wal"):
+        try:
+            st = os.stat(name)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def ensure_schema(conn):
+    """
+    Create derived columns, tables and indexes if missing, and rebuild
+    derived data if the source tables changed since it was last built.
+    Safe to call repeatedly, and from several processes at once: the checks
+    and changes run in one write transaction, so only the first process to
+    get there migrates and the rest find the schema already in place.
+    """
+    cursor = conn.cursor()
+
+    # WAL lets readers proceed while results are being entered (persistent setting)
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # New derived columns start out with placeholder values
+        added_columns = False
+
+        if not _has_column(cursor, 'races', 'is_competitive'):
+            # Competitive = both an R and a D candidate received votes
+            cursor.execute("ALTER TABLE races ADD COLUMN is_competitive INTEGER DEFAULT 0")
+            added_columns = True
+
+        if not _has_column(cursor, 'candidates', 'is_real'):
+            # Real candidate = not an Undervotes/Overvotes/Write-Ins tally row
+            cursor.execute("ALTER TABLE candidates ADD COLUMN is_real INTEGER NOT NULL DEFAULT 1")
+            added_columns = True
+
+        if not _has_column(cursor, 'results', 'is_town'):
+            cursor.execute("ALTER TABLE results ADD COLUMN is_town INTEGER NOT NULL DEFAULT 0")
+            added_columns = True
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in INDEXES if name not in existing]
+        for name in missing:
+            cursor.execute(INDEXES[name])
+        if missing:
+            # Give the query planner statistics for the new indexes
+            cursor.execute("ANALYZE")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS derived_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+        # Towns in each district as of the latest general election year
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS current_district_towns (
+                office TEXT,
+                district TEXT,
+                county TEXT,
+                town TEXT,
+                PRIMARY KEY (office, district, county, town)
+            )
+        """)
+
+        # Statewide R% per general election year over competitive races
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS statewide_baseline (
+                year INTEGER PRIMARY KEY,
+                r_pct REAL,
+                r_votes INTEGER,
+                d_votes INTEGER,
+                total INTEGER,
+                competitive_races INTEGER
+            )
+        """)
+
+        if added_columns or not _derived_current(cursor):
+            # Commits the transaction
+            _rebuild_derived(conn)
+        else:
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+_ensure_lock = threading.Lock()
+_ensured = False
+
+
+def ensure_schema_once(conn):
+    """Run ensure_schema() on the first connection made in this process."""
+    global _ensured
+    if _ensured:
+        return
+    with _ensure_lock:
+        if not _ensured:
+            ensure_schema(conn)
+            _ensured = True
+
+
+_checked_stamp = None
+
+
+def ensure_derived_current(conn, path=DB_PATH):
+    """
+    Make sure the schema exists and derived data matches the source tables,
+    checking again whenever the database file has changed since this process
+    last looked. Catches rows written without a refresh_derived() call (e.g.
+    by an import script) without a restart. conn is only read from, so it may
+    be query_only; a rebuild runs on a connection of its own.
+    """
+    global _checked_stamp, _ensured
+    stamp = db_stamp(path)
+    if stamp == _checked_stamp:
+        return
+    with _ensure_lock:
+        if stamp == _checked_stamp:
+            return
+        if not _ensured or not _derived_current(conn.cursor()):
+            writer = sqlite3.connect(path)
+            try:
+                ensure_schema(writer)
+            finally:
+                writer.close()
+            _ensured = True
+        # The stamp from before the check, so a write landing during it is
+        # looked at next time
+        _checked_stamp = stamp
+
+
+def refresh_derived(conn, race_id=None):
+    """
+    Rebuild derived data from the source tables and commit. Pass race_id
+    after editing one race's results to refresh only what depends on it.
+    Safe on any connection: creates the derived columns and tables first
+    if this process hasn't yet.
+    """
+    ensure_schema_once(conn)
+    _rebuild_derived(conn, race_id)
+
+
+def _rebuild_derived(conn, race_id=None):
+    cursor = conn.cursor()
+
+    race = None
+    if race_id is not None:
+        cursor.execute("""
+            SELECT e.year, e.election_type, o.name, r.district, r.county
+            FROM races r
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE r.id = ?
+        """, (race_id,))
+        race = cursor.fetchone()
+    # Parameters for the race-scoped statements below (none for a full rebuild)
+    race_params = (race_id,) if race else ()
+
+    # Only rows whose flag is out of date get written
+    cursor.execute(f"""
+        UPDATE results SET is_town = COALESCE({IS_TOWN_SQL}, 0)
+        WHERE is_town IS NOT COALESCE({IS_TOWN_SQL}, 0)
+        {'AND race_id = ?' if race else ''}
+    """, race_params)
+
+    cursor.execute(f"""
+        UPDATE candidates SET is_real = COALESCE(name NOT IN {NON_CANDIDATE_NAMES}, 0)
+        {'WHERE id IN (SELECT candidate_id FROM results WHERE race_id = ?)' if race else ''}
+    """, race_params)
+
+    cursor.execute(f"""
+        UPDATE races SET is_competitive = id IN (
+            SELECT res.race_id
+            FROM results res
+            JOIN candidates c ON res.candidate_id = c.id
+            WHERE c.is_real = 1
+            {'AND res.race_id = ?1' if race else ''}
+            GROUP BY res.race_id
+            HAVING SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) > 0
+            AND SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) > 0
+        )
+        {'WHERE id = ?1' if race else ''}
+    """, race_params)
+
+    # A race edit only changes its own year's baseline, and only for a
+    # general election
+    if not race or race[1] == 'general':
+        if race:
+            baseline_params = (race[0],)
+            cursor.execute("DELETE FROM statewide_baseline WHERE year = ?", baseline_params)
+        else:
+            baseline_params = ()
+            cursor.execute("DELETE FROM statewide_baseline")
+        cursor.execute(f"""
+            INSERT INTO statewide_baseline (year, r_pct, r_votes, d_votes, total, competitive_races)
+            SELECT year, CAST(SUM(r_votes) AS REAL) / SUM(total) * 100,
+                   SUM(r_votes), SUM(d_votes), SUM(total), COUNT(*)
+            FROM (
+                SELECT e.year,
+                       SUM(CASE WHEN c.party = 'Republican' THEN res.votes ELSE 0 END) as r_votes,
+                       SUM(CASE WHEN c.party = 'Democratic' THEN res.votes ELSE 0 END) as d_votes,
+                       SUM(res.votes) as total
+                FROM results res
+                JOIN candidates c ON res.candidate_id = c.id
+                JOIN races r ON res.race_id = r.id
+                JOIN elections e ON r.election_id = e.id
+                WHERE e.election_type = 'general'
+                AND r.is_competitive = 1
+                AND c.is_real = 1
+                {'AND e.year = ?' if race else ''}
+                GROUP BY e.year, r.id
+            )
+            GROUP BY year
+            HAVING SUM(total) > 0
+        """, baseline_params)
+
+    # Same rows the old per-request district town lookup used: any election
+    # held in the latest general election year. A race edit only touches its
+    # own district's rows, and only if it is in that year.
+    cursor.execute("SELECT MAX(year) FROM elections WHERE election_type = 'general'")
+    latest_year = cursor.fetchone()[0]
+    if not race or race[0] == latest_year:
+        if race:
+            district_params = (latest_year, race[2], race[3], race[4])
+            cursor.execute("""
+                DELETE FROM current_district_towns
+                WHERE office = ? AND district IS ? AND county IS ?
+            """, district_params[1:])
+        else:
+            district_params = (latest_year,)
+            cursor.execute("DELETE FROM current_district_towns")
+        cursor.execute(f"""
+            INSERT INTO current_district_towns (office, district, county, town)
+            SELECT DISTINCT o.name, r.district, r.county, res.municipality
+            FROM results res
+            JOIN races r ON res.race_id = r.id
+            JOIN elections e ON r.election_id = e.id
+            JOIN offices o ON r.office_id = o.id
+            WHERE e.year = ?
+            AND res.is_town = 1
+            {'AND o.name = ? AND r.district IS ? AND r.county IS ?' if race else ''}
+        """, district_params)
+
+    cursor.execute("""
+        INSERT OR REPLACE INTO derived_meta (key, value)
+        VALUES ('source_fingerprint', ?)
+    """, (_source_fingerprint(cursor),))
+    conn.commit()
+
+    # Refresh planner statistics if the data changed enough to matter
+    cursor.execute("PRAGMA optimize")
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_PATH)
+    refresh_derived(conn)
+    conn.close()
+    print("Derived data rebuilt")